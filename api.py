@@ -1,90 +1,298 @@
 import os
-import requests
 import time
-from datetime import datetime, timedelta
-from flask import jsonify
+import base64
+import atexit
+import threading
+from datetime import date, datetime, timedelta
+from flask import jsonify, request, Response
 from dotenv import load_dotenv
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
+import tmdb_client
+from search import SearchIndex
+from showtimes import ShowtimeCalendar
+from scheduler import ScheduleCache, parse_slots, DEFAULT_SLOTS, DEFAULT_CLOSING, DEFAULT_RUNTIME
+from movie_records import MovieSummary, MovieDetail, MovieDetails, compact_credits, compact_release_dates
+from tmdb_cache import (
+    create_cache, SingleFlight, BackgroundRefresher, SnapshotWriter, load_snapshot, Validated, EncodedBody,
+    MISSING, FRESH, STALE, NOT_MODIFIED
+)
 
 load_dotenv()
 
-API_KEY = os.getenv("TMDB_API_KEY")
-if not API_KEY:
-    raise ValueError("TMDB_API_KEY environment variable is not set")
-BASE_URL = "https://api.themoviedb.org/3"
-cache = {}
 CACHE_DURATION = 3600  # Increased to 1 hour (was 5 minutes) - movies don't change often
 
-# Create a session for connection pooling (reuses connections)
-session = requests.Session()
+# TTL per key family (longest matching prefix wins)
+CACHE_TTLS = {
+    "genres": 24 * 3600,  # Genre list practically never changes
+    "movies_": CACHE_DURATION,
+    "movie_detail_": CACHE_DURATION,
+    "movie_details_check_": 6 * 3600,  # Credits/certifications rarely change
+    "tmdb_": 6 * 3600,  # Raw per-movie TMDB resources (see get_movie_resource)
+}
 
+# How long an entry may keep being served stale while it refreshes in the background.
+# Only after this hard TTL do callers block on TMDB again.
+CACHE_HARD_TTLS = {
+    "genres": 7 * 24 * 3600,
+    "movies_": 24 * 3600,
+    "movie_detail_": 24 * 3600,
+    "movie_details_check_": 24 * 3600,
+    "tmdb_": 24 * 3600,
+}
 
-def get_cached_or_fetch(cache_key, fetch_function):
-    current_time = time.time()
-    if cache_key in cache:
-        data, timestamp = cache[cache_key]
-        if current_time - timestamp < CACHE_DURATION:
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+
+# "memory" keeps the cache in this process; "sqlite" shares one cache file
+# between every worker on the host so they all see the same "now showing" list
+CACHE_BACKEND = os.getenv("TMDB_CACHE_BACKEND", "memory")
+
+# Bounded, thread-safe LRU cache shared by all TMDB lookups
+cache = create_cache(
+    CACHE_BACKEND,
+    path=os.getenv("TMDB_CACHE_SQLITE_PATH", os.path.join(CACHE_DIR, "tmdb_cache.sqlite3")),
+    max_entries=int(os.getenv("TMDB_CACHE_MAX_ENTRIES", "2000")),
+    max_bytes=int(os.getenv("TMDB_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    ttls=CACHE_TTLS,
+    default_ttl=CACHE_DURATION,
+    hard_ttls=CACHE_HARD_TTLS,
+)
+
+# Concurrent misses for the same cache key wait on one in-flight fetch
+inflight = SingleFlight()
+
+# Refreshes stale entries off the request path
+refresher = BackgroundRefresher(max_workers=2)
+
+# Total time one API request may spend waiting on TMDB before it gives up
+REQUEST_DEADLINE = float(os.getenv("TMDB_REQUEST_DEADLINE", "8"))
+
+# How long one worker may hold the right to refresh a stale entry (shared backends)
+CACHE_REFRESH_LEASE = 120
+
+# Warms detail entries for the movies in a freshly built list. Kept to a couple of
+# workers so prefetching never crowds out requests for the rate limiter.
+DETAIL_PREFETCH_WORKERS = int(os.getenv("DETAIL_PREFETCH_WORKERS", "2"))
+prefetcher = BackgroundRefresher(max_workers=DETAIL_PREFETCH_WORKERS, name="detail-prefetch")
+# Lists whose movies get their detail pages warmed. Later coming-soon pages are
+# left out: their fetches would share the TMDB rate limit with user requests.
+DETAIL_PREFETCH_LISTS = ("now", "coming_page_1")
+
+# On-disk snapshot so restarts are served warm (set TMDB_CACHE_SNAPSHOT= to disable).
+# Not needed for persistent backends such as sqlite.
+CACHE_SNAPSHOT_PATH = os.getenv("TMDB_CACHE_SNAPSHOT", os.path.join(CACHE_DIR, "tmdb_cache.json"))
+CACHE_SNAPSHOT_INTERVAL = int(os.getenv("TMDB_CACHE_SNAPSHOT_INTERVAL", "300"))
+
+save_snapshots = bool(CACHE_SNAPSHOT_PATH) and not cache.persistent
+if save_snapshots:
+    restored = load_snapshot(cache, CACHE_SNAPSHOT_PATH)
+    if restored:
+        print(f"[CACHE] Restored {restored} entries from {CACHE_SNAPSHOT_PATH}")
+# Also purges expired entries on every tick, so it runs even when snapshots are off
+snapshot_writer = SnapshotWriter(cache, CACHE_SNAPSHOT_PATH if save_snapshots else None,
+                                 interval=CACHE_SNAPSHOT_INTERVAL)
+snapshot_writer.start()
+if save_snapshots:
+    atexit.register(snapshot_writer.save)
+
+
+def get_cached_or_fetch(cache_key, fetch_function, on_store=None):
+    """
+    Return cached data for cache_key, fetching it with fetch_function when needed
+    Fresh entries are returned as-is. Stale entries are returned immediately while
+    a background refresh runs. Only missing (or past hard TTL) entries block.
+
+    fetch_function may return a Validated value to store HTTP validators with it,
+    or NOT_MODIFIED to just extend the TTL of the value already cached.
+    on_store, if given, is called with each newly fetched value once it's cached.
+    While the TMDB circuit breaker is open, whatever is cached is served as-is.
+    """
+    if not tmdb_client.breaker.available():
+        # TMDB is down: serve the last known value, however old, instead of waiting on it
+        data = cache.peek(cache_key, MISSING)
+        if data is not MISSING:
+            return data
+
+    data, state = cache.lookup(cache_key)
+
+    def fetch_and_store():
+        # A previous in-flight fetch may have filled the cache just before we got here
+        data = cache.get(cache_key, MISSING, count=False)
+        if data is not MISSING:
             return data
-    # Fetch new data
-    data = fetch_function()
-    cache[cache_key] = (data, current_time)
-    return data
+        result = fetch_function()
+        if result is NOT_MODIFIED:
+            data = cache.touch(cache_key)
+            if data is not MISSING:
+                return data
+            # Evicted while revalidating: the retry has no validators, so it's a full fetch
+            result = fetch_function()
+        if isinstance(result, Validated):
+            data = cache.set(cache_key, result.value, validators=result.validators)
+        else:
+            data = cache.set(cache_key, result)
+        if on_store is not None:
+            on_store(data)
+        return data
+
+    if state is FRESH:
+        return data
+    if state is STALE:
+        # With a shared backend only the worker holding the lease refreshes
+        if cache.claim_refresh(cache_key, CACHE_REFRESH_LEASE):
+            refresher.submit(cache_key, lambda: inflight.do(cache_key, fetch_and_store))
+        return data
+
+    # Fetch new data (errors are shared with waiters but never cached).
+    # Waiters give up when their own request deadline runs out.
+    return inflight.do(cache_key, fetch_and_store, timeout=tmdb_client.remaining())
+
+
+# Bodies smaller than this aren't worth compressing
+GZIP_MIN_BYTES = 1024
+
+
+def get_cached_response(cache_key, fetch_function, on_store=None):
+    """
+    Like get_cached_or_fetch, but returns a JSON response built from the
+    entry's pre-serialized bytes. Honors If-None-Match (304) and serves the
+    stored gzip variant to clients that accept it.
+    """
+    data = get_cached_or_fetch(cache_key, fetch_function, on_store)
+    # The entry can be evicted between the two calls; fall back to encoding it here
+    encoded = cache.encoded(cache_key) or EncodedBody.from_value(data)
+    return json_response(encoded)
+
+
+def json_response(encoded):
+    """Build a Response for an EncodedBody with ETag / 304 / gzip handling"""
+    use_gzip = len(encoded.body) >= GZIP_MIN_BYTES and "gzip" in request.headers.get("Accept-Encoding", "")
+    # Each representation gets its own ETag; either one still matches for a 304
+    etag = f"{encoded.etag}-gzip" if use_gzip else encoded.etag
+    if request.if_none_match.contains(encoded.etag) or request.if_none_match.contains(f"{encoded.etag}-gzip"):
+        response = Response(status=304)
+    else:
+        response = Response(encoded.gzipped if use_gzip else encoded.body, mimetype="application/json")
+        if use_gzip:
+            response.headers["Content-Encoding"] = "gzip"
+    response.set_etag(etag)
+    response.headers["Vary"] = "Accept-Encoding"
+    # Let browsers keep the body but revalidate it on every use
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def get_cache_stats():
+    """Return cache hit/miss/eviction counters"""
+    stats = cache.stats()
+    stats["coalesced"] = inflight.coalesced
+    stats["in_flight"] = inflight.in_flight()
+    stats["background"] = refresher.stats()
+    stats["prefetch"] = prefetcher.stats()
+    stats["page_prefetch"] = page_prefetcher.stats()
+    stats["search"] = search_index.stats()
+    stats["schedules_computed"] = schedules.computed
+    stats["tmdb"] = tmdb_client.stats()
+    return jsonify(stats)
+
+
+def fetch_genres():
+    # Revalidate the cached list instead of downloading it again
+    genres, validators = tmdb_client.get_json_conditional(
+        "/genre/movie/list", {"language": "en-US"}, cache.validators("genres")
+    )
+    return NOT_MODIFIED if genres is None else Validated(genres, validators)
+
+
+def load_genres():
+    """Return the (cached) TMDB genre list"""
+    return get_cached_or_fetch("genres", fetch_genres)
 
 
 def get_genres():
     try:
-        def fetch_genres():
-            url = f"{BASE_URL}/genre/movie/list?api_key={API_KEY}&language=en-US"
-            response = session.get(url, timeout=10)
-            return response.json()
-
-        result = get_cached_or_fetch("genres", fetch_genres)
-        return jsonify(result)
+        with tmdb_client.deadline(REQUEST_DEADLINE):
+            return get_cached_response("genres", fetch_genres)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-def get_movie_schedule(movie_index):
+# Raw TMDB resources cached per movie id, shared by discovery and the detail page
+MOVIE_RESOURCES = ("movie", "credits", "release_dates")
+
+
+def fetch_movie_bundle(movie_id):
     """
-    Generate schedule for a movie based on its index (0-7)
-    Movies 0-3: Group A (Mon, Wed, Fri, Sun) - MWF pattern
-    Movies 4-7: Group B (Tue, Thu, Sat) - TTS pattern
-    Each movie shows twice per day across Cinema 1 and Cinema 2
-    
-    Time slot assignment to prevent conflicts:
-    - Movie 0: 10:00 AM (Cinema 1), 1:00 PM (Cinema 2)
-    - Movie 1: 1:00 PM (Cinema 1), 4:00 PM (Cinema 2)
-    - Movie 2: 4:00 PM (Cinema 1), 7:00 PM (Cinema 2)
-    - Movie 3: 7:00 PM (Cinema 1), 10:00 AM (Cinema 2)
-    - Movie 4-7: Same pattern for different days
+    Fetch a movie with its credits and release dates appended in a single TMDB call
+    Splits the response into the separate resources and caches each of them.
+    When all three are still cached the call is a conditional request, and a
+    304 Not Modified just extends their TTL.
+    Returns (bundle, validators).
     """
-    # Time slots: 10:00 AM, 1:00 PM, 4:00 PM, 7:00 PM
-    time_slots = ["10:00 AM", "1:00 PM", "4:00 PM", "7:00 PM"]
-    
-    # Determine which group this movie belongs to
-    if movie_index < 4:
-        # Group A: Monday(1), Wednesday(3), Friday(5), Sunday(0)
-        allowed_weekdays = [1, 3, 5, 0]
-        # Each movie gets unique time slots
-        # Movie 0: slots 0,1 (10AM, 1PM)
-        # Movie 1: slots 1,2 (1PM, 4PM)
-        # Movie 2: slots 2,3 (4PM, 7PM)
-        # Movie 3: slots 3,0 (7PM, 10AM)
-        slot1_index = movie_index % 4
-        slot2_index = (movie_index + 1) % 4
-    else:
-        # Group B: Tuesday(2), Thursday(4), Saturday(6)
-        allowed_weekdays = [2, 4, 6]
-        # Movies 4-7 use the same time slot pattern as 0-3
-        adjusted_index = movie_index - 4
-        slot1_index = adjusted_index % 4
-        slot2_index = (adjusted_index + 1) % 4
-    
-    return {
-        "allowed_weekdays": allowed_weekdays,
-        "time_slots": [time_slots[slot1_index], time_slots[slot2_index]],
-        "all_times": time_slots  # All available times for display
-    }
+    keys = {resource: f"tmdb_{resource}_{movie_id}" for resource in MOVIE_RESOURCES}
+    path = f"/movie/{movie_id}"
+    params = {"language": "en-US", "append_to_response": "credits,release_dates"}
+
+    def fetch_bundle():
+        validators = None
+        if all(cache.peek(key, MISSING) is not MISSING for key in keys.values()):
+            validators = cache.validators(keys["movie"])
+        movie, validators = tmdb_client.get_json_conditional(path, params, validators)
+        if movie is None:
+            bundle = {resource: cache.touch(key) for resource, key in keys.items()}
+            if not any(data is MISSING for data in bundle.values()):
+                return bundle, validators
+            movie, validators = tmdb_client.get_json_conditional(path, params)
+
+        # Only the fields the site uses are kept (see movie_records)
+        bundle = {
+            "credits": compact_credits(movie.pop("credits", {})),
+            "release_dates": compact_release_dates(movie.pop("release_dates", {})),
+            "movie": MovieDetail.from_dict(movie),
+        }
+        for resource, data in bundle.items():
+            cache.set(keys[resource], data, validators=validators)
+        return bundle, validators
+
+    # Concurrent lookups of different resources of one movie share the call
+    return inflight.do(f"tmdb_bundle_{movie_id}", fetch_bundle, timeout=tmdb_client.remaining())
+
+
+def get_movie_resource(movie_id, resource):
+    """
+    Get one TMDB resource ("movie", "credits" or "release_dates") for a movie
+    The movie is a MovieDetail record; credits and release dates are trimmed dicts.
+    Each resource is fetched at most once per TTL no matter who asks for it
+    """
+    def fetch_resource():
+        bundle, validators = fetch_movie_bundle(movie_id)
+        return Validated(bundle[resource], validators)
+
+    return get_cached_or_fetch(f"tmdb_{resource}_{movie_id}", fetch_resource)
+
+
+# Cinema layout used to schedule the now showing movies (see scheduler.py)
+CINEMA_ROOMS = int(os.getenv("CINEMA_ROOMS", "2"))
+SHOWTIME_SLOTS = parse_slots(os.getenv("SHOWTIME_SLOTS", ", ".join(DEFAULT_SLOTS)))
+CLOSING_TIME = os.getenv("CLOSING_TIME", DEFAULT_CLOSING)
+schedules = ScheduleCache()
+
+
+def schedule_now_showing(movie_ids):
+    """
+    Return the WeeklySchedule for the now showing movies (in display order)
+    Runtimes come from the cached TMDB movie resources; the result is memoized
+    per list of (id, runtime), so an unchanged catalog isn't rescheduled.
+    """
+    movies = []
+    for movie_id in movie_ids:
+        try:
+            runtime = get_movie_resource(movie_id, "movie").runtime
+        except tmdb_client.TRANSIENT_ERRORS as e:
+            # Schedule it as a typical movie rather than failing the whole list
+            print(f"[SCHEDULE] No runtime for movie {movie_id} ({e}), assuming {DEFAULT_RUNTIME} min")
+            runtime = DEFAULT_RUNTIME
+        movies.append((movie_id, runtime))
+    return schedules.get(movies, rooms=CINEMA_ROOMS, slots=SHOWTIME_SLOTS, closing=CLOSING_TIME)
 
 
 def has_complete_details(movie_id):
@@ -92,244 +300,456 @@ def has_complete_details(movie_id):
     Check if a movie has complete details (cast, directors, producers, writers, certification)
     Uses caching to avoid repeated API calls for the same movie
     """
-    # Check cache first
-    cache_key = f"movie_details_check_{movie_id}"
-    if cache_key in cache:
-        result, timestamp = cache[cache_key]
-        if time.time() - timestamp < CACHE_DURATION:
-            return result
-    
-    try:
-        credits_url = f"{BASE_URL}/movie/{movie_id}/credits?api_key={API_KEY}&language=en-US"
-        release_url = f"{BASE_URL}/movie/{movie_id}/release_dates?api_key={API_KEY}"
-        
-        # Use session for connection pooling
-        credits = session.get(credits_url, timeout=5).json()
-        releases = session.get(release_url, timeout=5).json()
-        
-        # Check cast (at least 1 cast member)
-        cast = credits.get("cast", [])
-        if not cast or len(cast) == 0:
-            cache[cache_key] = (False, time.time())
-            return False
-        
-        # Check directors (at least 1)
-        directors = [crew for crew in credits.get("crew", []) if crew.get("job") == "Director"]
-        if not directors or len(directors) == 0:
-            cache[cache_key] = (False, time.time())
-            return False
-        
-        # Check producers (at least 1)
-        producers = [crew for crew in credits.get("crew", []) if crew.get("job") == "Producer"]
-        if not producers or len(producers) == 0:
-            cache[cache_key] = (False, time.time())
-            return False
-        
-        # Check writers (at least 1)
-        writers = [crew for crew in credits.get("crew", []) if crew.get("job") in ["Writer", "Screenplay", "Story"]]
-        if not writers or len(writers) == 0:
-            cache[cache_key] = (False, time.time())
-            return False
-        
-        # Check certification
-        has_certification = False
-        for country in releases.get("results", []):
-            if country["iso_3166_1"] in ["PH", "US"]:
-                for release in country.get("release_dates", []):
-                    if release.get("certification"):
-                        has_certification = True
+    def check_details():
+        try:
+            # Raw resources are cached so get_movie_details can reuse them later
+            credits = get_movie_resource(movie_id, "credits")
+            releases = get_movie_resource(movie_id, "release_dates")
+            
+            # Check cast (at least 1 cast member)
+            cast = credits.get("cast", [])
+            if not cast or len(cast) == 0:
+                return False
+            
+            # Check directors (at least 1)
+            directors = [crew for crew in credits.get("crew", []) if crew.get("job") == "Director"]
+            if not directors or len(directors) == 0:
+                return False
+            
+            # Check producers (at least 1)
+            producers = [crew for crew in credits.get("crew", []) if crew.get("job") == "Producer"]
+            if not producers or len(producers) == 0:
+                return False
+            
+            # Check writers (at least 1)
+            writers = [crew for crew in credits.get("crew", []) if crew.get("job") in ["Writer", "Screenplay", "Story"]]
+            if not writers or len(writers) == 0:
+                return False
+            
+            # Check certification
+            has_certification = False
+            for country in releases.get("results", []):
+                if country["iso_3166_1"] in ["PH", "US"]:
+                    for release in country.get("release_dates", []):
+                        if release.get("certification"):
+                            has_certification = True
+                            break
+                    if has_certification:
                         break
-                if has_certification:
-                    break
-        
-        if not has_certification:
-            cache[cache_key] = (False, time.time())
+            
+            return has_certification
+        except tmdb_client.TRANSIENT_ERRORS:
+            # An outage or timeout isn't a verdict on the movie, so don't cache "incomplete"
+            raise
+        except:
             return False
-        
-        cache[cache_key] = (True, time.time())
-        return True
-    except:
-        cache[cache_key] = (False, time.time())
-        return False
+
+    return get_cached_or_fetch(f"movie_details_check_{movie_id}", check_details)
+
+
+# Showtime calendar for the cached "now showing" list, with the (list ETag, day) it was built for
+_calendar = None
+_calendar_key = None
+_calendar_lock = threading.Lock()
+
+
+def get_showtime_calendar():
+    """
+    Return the ShowtimeCalendar for the cached "now showing" list
+    Rebuilt only when the list changes or the day rolls over.
+    """
+    global _calendar, _calendar_key
+    encoded = cache.encoded("movies_now")
+    key = (encoded.etag if encoded else None, date.today())
+    with _calendar_lock:
+        if _calendar_key != key:
+            movies = cache.peek("movies_now")
+            _calendar = ShowtimeCalendar(movies["results"] if movies else [], key[1])
+            _calendar_key = key
+        return _calendar
 
 
 def get_movie_schedule_api(movie_id):
     """
     API endpoint to get schedule for a specific movie ID
+    Returns the weekly pattern (allowed_weekdays / time_slots) plus its concrete showtimes.
     """
     try:
-        cache_key = "movies_now"
-        if cache_key in cache:
-            cached_movies, _ = cache[cache_key]
-            if "results" in cached_movies:
-                for index, movie in enumerate(cached_movies["results"]):
-                    if movie["id"] == movie_id:
-                        schedule = get_movie_schedule(index)
-                        return jsonify(schedule)
-        return jsonify({"error": "Movie not found in current schedule"}), 404
+        calendar = get_showtime_calendar()
+        schedule = calendar.schedule(movie_id)
+        if schedule is None:
+            return jsonify({"error": "Movie not found in current schedule"}), 404
+        showtimes = [showtime.to_dict() for showtime in calendar.for_movie(movie_id)]
+        return jsonify(dict(schedule, showtimes=showtimes))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-def get_movies(movie_type):
+def get_showtimes_api():
+    """API endpoint listing every showtime on ?date=YYYY-MM-DD (default today)"""
+    day = request.args.get("date") or date.today().isoformat()
     try:
-        def fetch_movies():
-            today = datetime.now()
-            # Date range: From 30 days ago to 14th day of current month (wider range for more movies)
-            thirty_days_ago = (today - timedelta(days=30)).strftime('%Y-%m-%d')
-            fourteenth_day = today.replace(day=14).strftime('%Y-%m-%d') if today.day <= 14 else today.strftime('%Y-%m-%d')
-            two_months_later = (today + timedelta(days=60)).strftime('%Y-%m-%d')
-            
-            if movie_type == "now":
-                # For "now showing", fetch movies in batches and validate in parallel
-                complete_movies = []
-                page = 1
-                max_pages = 10
-                
-                while len(complete_movies) < 8 and page <= max_pages:
-                    url = f"{BASE_URL}/discover/movie?api_key={API_KEY}&language=en-US&region=PH&with_release_type=2|3&page={page}"
-                    url += f"&release_date.gte={thirty_days_ago}&release_date.lte={fourteenth_day}"
-                    url += "&sort_by=release_date.desc"
-                    
-                    response = session.get(url, timeout=10)
-                    data = response.json()
-                    
-                    if "results" in data and len(data["results"]) > 0:
-                        # Filter movies with posters first (fast check)
-                        candidates = [m for m in data["results"] if m.get("poster_path")]
-                        
-                        # Validate movies in parallel using ThreadPoolExecutor
-                        def check_movie(movie):
-                            if has_complete_details(movie["id"]):
-                                return movie
-                            return None
-                        
-                        with ThreadPoolExecutor(max_workers=5) as executor:
-                            futures = {executor.submit(check_movie, m): m for m in candidates}
-                            for future in as_completed(futures):
-                                result = future.result()
-                                if result and len(complete_movies) < 8:
-                                    complete_movies.append(result)
-                    else:
-                        break  # No more results
-                    
-                    page += 1
-                    
-                    # Stop if we have enough movies
-                    if len(complete_movies) >= 8:
-                        break
-                
-                # Sort by release date descending and limit to 8
-                complete_movies = sorted(complete_movies, key=lambda x: x.get('release_date', ''), reverse=True)[:8]
-                
-                # Add schedule information to each movie and mark as now showing
-                for index, movie in enumerate(complete_movies):
-                    movie["schedule"] = get_movie_schedule(index)
-                    movie["is_now_showing"] = True
-                
-                return {"results": complete_movies}
-                
-            elif movie_type == "coming":
-                # Get the list of "now showing" movie IDs to exclude them
-                now_showing_cache_key = "movies_now"
-                now_showing_ids = []
-                if now_showing_cache_key in cache:
-                    cached_now, _ = cache[now_showing_cache_key]
-                    if "results" in cached_now:
-                        now_showing_ids = [m["id"] for m in cached_now["results"]]
-                
-                # For "coming soon", start from tomorrow to get upcoming movies
-                tomorrow = (today + timedelta(days=1)).strftime('%Y-%m-%d')
-                url = f"{BASE_URL}/discover/movie?api_key={API_KEY}&language=en-US&region=PH&with_release_type=2|3&page=1"
-                url += f"&release_date.gte={tomorrow}&release_date.lte={two_months_later}"
-                
-                response = session.get(url, timeout=10)
-                data = response.json()
-                
-                # Filter out movies without poster images and movies already in "now showing"
-                if "results" in data:
-                    data["results"] = [
-                        movie for movie in data["results"] 
-                        if movie.get("poster_path") is not None and movie["id"] not in now_showing_ids
-                    ]
-                    # Mark all coming soon movies
-                    for movie in data["results"]:
-                        movie["is_now_showing"] = False
-                
-                return data
-
-        cache_key = f"movies_{movie_type}"
-        result = get_cached_or_fetch(cache_key, fetch_movies)
-        return jsonify(result)
+        datetime.strptime(day, "%Y-%m-%d")
+    except ValueError:
+        return jsonify({"error": "date must be YYYY-MM-DD"}), 400
+    try:
+        showtimes = get_showtime_calendar().on(day)
+        return jsonify({"date": day, "showtimes": [showtime.to_dict() for showtime in showtimes]})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-def get_movie_details(movie_id):
+NOW_SHOWING_SLOTS = 8
+DISCOVER_MAX_PAGES = 10
+# How many discover pages may be fetched ahead of the one being validated
+DISCOVER_PREFETCH_PAGES = 1
+
+
+def discover_now_showing(release_from, release_to):
+    """
+    Find the newest NOW_SHOWING_SLOTS movies with complete details
+    Discover pages are prefetched a few at a time and their candidates are
+    validated as soon as a page arrives. Slots are filled strictly in the
+    release-date order TMDB returns, and all outstanding page fetches and
+    checks are cancelled once every slot is taken.
+    """
+    def fetch_page(page):
+        return tmdb_client.get_json("/discover/movie", {
+            "language": "en-US",
+            "region": "PH",
+            "with_release_type": "2|3",
+            "page": page,
+            "release_date.gte": release_from,
+            "release_date.lte": release_to,
+            "sort_by": "release_date.desc",
+        })
+
+    pending_pages = deque()  # (page, future) in page order
+    checks = deque()  # (page, movie, future) in release-date order
+    complete_movies = []
+    next_page = 1
+    validating_page = 1
+    exhausted = False
+
     try:
-        # Check cache first for movie details
-        cache_key = f"movie_detail_{movie_id}"
-        if cache_key in cache:
-            cached_data, timestamp = cache[cache_key]
-            if time.time() - timestamp < CACHE_DURATION:
-                return cached_data
-        
-        # Fetch movie details in parallel using ThreadPoolExecutor
-        movie_url = f"{BASE_URL}/movie/{movie_id}?api_key={API_KEY}&language=en-US"
-        credits_url = f"{BASE_URL}/movie/{movie_id}/credits?api_key={API_KEY}&language=en-US"
-        release_url = f"{BASE_URL}/movie/{movie_id}/release_dates?api_key={API_KEY}"
+        while len(complete_movies) < NOW_SHOWING_SLOTS:
+            # Keep the next page(s) in flight while the current one is validated
+            if checks:
+                validating_page = checks[0][0]
+            while not exhausted and next_page <= min(validating_page + DISCOVER_PREFETCH_PAGES, DISCOVER_MAX_PAGES):
+                pending_pages.append((next_page, tmdb_client.submit(fetch_page, next_page)))
+                next_page += 1
 
-        def fetch_url(url):
-            return session.get(url, timeout=10).json()
-        
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            future_movie = executor.submit(fetch_url, movie_url)
-            future_credits = executor.submit(fetch_url, credits_url)
-            future_releases = executor.submit(fetch_url, release_url)
-            
-            movie = future_movie.result()
-            credits = future_credits.result()
-            releases = future_releases.result()
-
-        # Get certification (Age Rating)
-        certification = "N/A"
-        for country in releases.get("results", []):
-            if country["iso_3166_1"] in ["PH", "US"]:
-                for release in country.get("release_dates", []):
-                    if release.get("certification"):
-                        certification = release["certification"]
-                        break
-                if certification != "N/A":
+            # Feed candidates from every page that has arrived (or wait for one if nothing is queued)
+            while pending_pages and (pending_pages[0][1].done() or not checks):
+                page, future = pending_pages.popleft()
+                data = tmdb_client.result(future)
+                if not data.get("results"):
+                    # No more results, later pages will be empty too
+                    exhausted = True
+                    for _, future in pending_pages:
+                        future.cancel()
+                    pending_pages.clear()
                     break
+                # Filter movies with posters first (fast check)
+                for movie in data["results"]:
+                    if movie.get("poster_path"):
+                        checks.append((page, movie, tmdb_client.submit(has_complete_details, movie["id"])))
+                if not checks:
+                    # Nothing on this page to validate, move the prefetch window on
+                    validating_page = page
+
+            if not checks:
+                if pending_pages or (not exhausted and next_page <= DISCOVER_MAX_PAGES):
+                    continue
+                break
+            _, movie, future = checks.popleft()
+            try:
+                complete = tmdb_client.result(future)
+            except (tmdb_client.DeadlineExceeded, tmdb_client.CircuitOpenError):
+                raise  # Every other check would fail the same way
+            except tmdb_client.TRANSIENT_ERRORS as e:
+                # No verdict was cached; the movie is checked again on the next build
+                print(f"[DISCOVER] Skipping movie {movie['id']} for now: {e}")
+                continue
+            if complete:
+                complete_movies.append(movie)
+    finally:
+        # Slots are full (or discovery failed): drop work that hasn't started yet
+        for _, future in pending_pages:
+            future.cancel()
+        for _, _, future in checks:
+            future.cancel()
+
+    return complete_movies
 
-        # Get cast (top 5)
-        cast = [member["name"] for member in credits.get("cast", [])[:5]]
+
+def fetch_movies(movie_type):
+    """Build the "now" showing movie list from TMDB (coming soon is paged, see fetch_coming_page)"""
+    today = datetime.now()
+    # Date range: From 30 days ago to 14th day of current month (wider range for more movies)
+    thirty_days_ago = (today - timedelta(days=30)).strftime('%Y-%m-%d')
+    fourteenth_day = today.replace(day=14).strftime('%Y-%m-%d') if today.day <= 14 else today.strftime('%Y-%m-%d')
+    
+    if movie_type == "now":
+        # For "now showing", stream discover pages into parallel completeness checks
+        complete_movies = discover_now_showing(thirty_days_ago, fourteenth_day)
         
-        # Get directors
-        directors = [crew["name"] for crew in credits.get("crew", []) if crew.get("job") == "Director"]
+        # Sort by release date descending and limit to 8
+        complete_movies = sorted(complete_movies, key=lambda x: x.get('release_date', ''), reverse=True)[:8]
         
-        # Get producers
-        producers = [crew["name"] for crew in credits.get("crew", []) if crew.get("job") == "Producer"][:3]
+        # Add schedule information to each movie and mark as now showing
+        week = schedule_now_showing([movie["id"] for movie in complete_movies])
+        if week.unscheduled:
+            print(f"[SCHEDULE] No room for movies {week.unscheduled} with {CINEMA_ROOMS} rooms")
+        results = [
+            MovieSummary.from_dict(dict(movie, schedule=week.for_movie(movie["id"]), is_now_showing=True))
+            for movie in complete_movies
+        ]
         
-        # Get writers
-        writers = [crew["name"] for crew in credits.get("crew", []) if crew.get("job") in ["Writer", "Screenplay", "Story"]][:3]
+        return {"results": results}
+
+
+# Coming soon is served one TMDB discover page at a time
+COMING_MAX_PAGES = 10
+# Pages fetched in the background ahead of the one just served. They get their own
+# worker so they don't queue behind detail prefetches.
+COMING_PREFETCH_PAGES = 2
+page_prefetcher = BackgroundRefresher(max_workers=1, name="page-prefetch")
+
+
+def encode_cursor(page):
+    """Opaque cursor for a coming-soon page"""
+    return base64.urlsafe_b64encode(f"page:{page}".encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return the page a cursor points at (1 without a cursor); raises ValueError if it's invalid"""
+    if not cursor:
+        return 1
+    text = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+    kind, _, page = text.partition(":")
+    page = int(page)
+    if kind != "page" or not 1 <= page <= COMING_MAX_PAGES:
+        raise ValueError(f"cursor out of range: {cursor}")
+    return page
+
+
+def fetch_coming_page(page):
+    """Build one page of the "coming soon" list from TMDB"""
+    today = datetime.now()
+    # For "coming soon", start from tomorrow to get upcoming movies
+    tomorrow = (today + timedelta(days=1)).strftime('%Y-%m-%d')
+    two_months_later = (today + timedelta(days=60)).strftime('%Y-%m-%d')
+    data = tmdb_client.get_json("/discover/movie", {
+        "language": "en-US",
+        "region": "PH",
+        "with_release_type": "2|3",
+        "page": page,
+        "release_date.gte": tomorrow,
+        "release_date.lte": two_months_later,
+    })
+    
+    # Filter out movies without poster images and mark the rest as coming soon.
+    # Movies now showing are removed when the page is read (see exclude_now_showing),
+    # so cached pages stay correct when the now showing list changes.
+    results = [
+        MovieSummary.from_dict(dict(movie, is_now_showing=False))
+        for movie in data.get("results", [])
+        if movie.get("poster_path") is not None
+    ]
+    last_page = min(data.get("total_pages") or page, COMING_MAX_PAGES)
+    return {
+        "page": data.get("page", page),
+        "results": results,
+        "total_pages": data.get("total_pages"),
+        "total_results": data.get("total_results"),
+        "next_cursor": encode_cursor(page + 1) if page < last_page else None,
+    }
+
+
+def exclude_now_showing(movies):
+    """Return a coming-soon page without the movies currently in "now showing" (the same object if none are)"""
+    cached_now = cache.peek("movies_now")
+    if not movies or not cached_now:
+        return movies
+    now_showing_ids = {movie.id for movie in cached_now["results"]}
+    if not any(movie.id in now_showing_ids for movie in movies["results"]):
+        return movies
+    return dict(movies, results=[movie for movie in movies["results"] if movie.id not in now_showing_ids])
+
+
+def prefetch_coming_pages(page, movies):
+    """Fill the cache with the coming-soon pages after `page` so scrolling doesn't wait on TMDB"""
+    if not movies or not movies.get("next_cursor"):
+        return
+    for next_page in range(page + 1, min(page + COMING_PREFETCH_PAGES, COMING_MAX_PAGES) + 1):
+        name = f"coming_page_{next_page}"
+        if cache.lookup(f"movies_{name}", count=False)[1] is FRESH:
+            continue
+        page_prefetcher.submit(f"movies_{name}", lambda name=name: load_movie_list(name))
+
+
+def load_movie_list(name):
+    """
+    Return the (cached) movie list "now" or "coming_page_<n>", exactly as cached
+    Raises ValueError for any other name.
+    """
+    if name.startswith("coming_page_"):
+        page = name[len("coming_page_"):]
+        if not page.isdigit() or not 1 <= int(page) <= COMING_MAX_PAGES:
+            raise ValueError(f"Unknown movie list: {name}")
+        fetch = lambda: fetch_coming_page(int(page))
+    elif name == "now":
+        fetch = lambda: fetch_movies(name)
+    else:
+        raise ValueError(f"Unknown movie list: {name}")
+    return get_cached_or_fetch(f"movies_{name}", fetch, lambda movies: catalog_updated(name, movies))
+
+
+# Movie lists served by /api/movies/<movie_type>
+MOVIE_TYPES = ("now", "coming")
+
+
+def load_movies(movie_type):
+    """Return the (cached) "now" list or the first "coming" page"""
+    if movie_type == "coming":
+        return exclude_now_showing(load_movie_list("coming_page_1"))
+    return load_movie_list(movie_type)
+
+
+def get_movies(movie_type):
+    """
+    Movie list endpoint. ?fields=id,title,... limits each movie to the given
+    MovieSummary fields (the projected body is encoded per request).
+    "coming" is paginated: pass the response's next_cursor as ?cursor= for the next page.
+    """
+    if movie_type not in MOVIE_TYPES:
+        return jsonify({"error": f"Unknown movie list: {movie_type}"}), 404
+
+    fields = [name.strip() for name in request.args.get("fields", "").split(",") if name.strip()]
+    unknown = [name for name in fields if name not in MovieSummary.__slots__]
+    if unknown:
+        return jsonify({
+            "error": f"Unknown fields: {', '.join(unknown)}",
+            "allowed_fields": list(MovieSummary.__slots__),
+        }), 400
+
+    name = movie_type
+    if movie_type == "coming":
+        try:
+            page = decode_cursor(request.args.get("cursor"))
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+        name = f"coming_page_{page}"
+
+    try:
+        with tmdb_client.deadline(REQUEST_DEADLINE):
+            data = load_movie_list(name)
+        visible = data
+        if movie_type == "coming":
+            prefetch_coming_pages(page, data)
+            visible = exclude_now_showing(data)
+
+        if visible is data and not fields:
+            # Unchanged cached value: serve its pre-serialized body
+            return json_response(cache.encoded(f"movies_{name}") or EncodedBody.from_value(data))
+        if fields and visible is not None:
+            visible = dict(visible, results=[movie.to_dict(fields) for movie in visible["results"]])
+        return json_response(EncodedBody.from_value(visible))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def catalog_updated(name, movies):
+    """Called whenever a movie list is rebuilt: re-index it for search and warm its detail pages (first lists only)"""
+    if name != "now":
+        movies = exclude_now_showing(movies)
+    search_index.update_list(name, (movies or {}).get("results", []), cached_people)
+    if name in DETAIL_PREFETCH_LISTS:
+        prefetch_movie_details(movies)
+
+
+def prefetch_movie_details(movies):
+    """Queue detail fetches for every movie in a freshly built movie list"""
+    for movie in (movies or {}).get("results", []):
+        movie_id = movie.id
+        cache_key = f"movie_detail_{movie_id}"
+        if cache.lookup(cache_key, count=False)[1] is FRESH:
+            continue
+        prefetcher.submit(cache_key, lambda movie_id=movie_id: load_movie_details(movie_id))
+
+
+def fetch_movie_details(movie_id):
+    """Build the cached part of a movie's detail page from its TMDB resources"""
+    # One TMDB call fetches all three resources (usually already cached by has_complete_details)
+    movie = get_movie_resource(movie_id, "movie")
+    credits = get_movie_resource(movie_id, "credits")
+    releases = get_movie_resource(movie_id, "release_dates")
+
+    # Get certification (Age Rating)
+    certification = "N/A"
+    for country in releases.get("results", []):
+        if country["iso_3166_1"] in ["PH", "US"]:
+            for release in country.get("release_dates", []):
+                if release.get("certification"):
+                    certification = release["certification"]
+                    break
+            if certification != "N/A":
+                break
+
+    # Get cast (top 5)
+    cast = [member["name"] for member in credits.get("cast", [])[:5]]
+
+    # Get directors
+    directors = [crew["name"] for crew in credits.get("crew", []) if crew.get("job") == "Director"]
+
+    # Get producers
+    producers = [crew["name"] for crew in credits.get("crew", []) if crew.get("job") == "Producer"][:3]
+
+    # Get writers
+    writers = [crew["name"] for crew in credits.get("crew", []) if crew.get("job") in ["Writer", "Screenplay", "Story"]][:3]
+
+    return MovieDetails(
+        movie=movie,
+        certification=certification,
+        cast=cast,
+        directors=directors,
+        producers=producers,
+        writers=writers,
+    )
 
-        # Get movie schedule from current "now showing" list and check if it's now showing
+
+def load_movie_details(movie_id):
+    """Return the (cached) MovieDetails record for a movie"""
+    # Concurrent requests for the same movie share a single fetch
+    return get_cached_or_fetch(
+        f"movie_detail_{movie_id}",
+        lambda: fetch_movie_details(movie_id),
+        lambda details: search_index.update_people(movie_id, details.cast + details.directors),
+    )
+
+
+def get_movie_details(movie_id):
+    try:
+        with tmdb_client.deadline(REQUEST_DEADLINE):
+            details = load_movie_details(movie_id)
+        # Work on plain dict copies so formatting the release date doesn't touch the cached record
+        result_data = details.to_dict()
+        movie = details.movie.to_dict()
+
+        # Get movie schedule from current "now showing" list and check if it's now showing.
+        # Worked out per request so prefetched details follow later changes to the list.
         schedule = None
         is_now_showing = False
         cached_release_date = None  # Store the release date from the movie list (more accurate for PH)
         try:
-            now_cache_key = "movies_now"
-            if now_cache_key in cache:
-                cached_movies, _ = cache[now_cache_key]
-                if "results" in cached_movies:
-                    for index, cached_movie in enumerate(cached_movies["results"]):
-                        if cached_movie["id"] == movie_id:
-                            schedule = get_movie_schedule(index)
-                            is_now_showing = True
-                            # Get the release date from the cached movie list (this matches the thumbnail)
-                            cached_release_date = cached_movie.get("release_date")
-                            break
+            now_showing = get_showtime_calendar().movie(movie_id)
+            if now_showing is not None:
+                schedule = now_showing.schedule
+                is_now_showing = True
+                # Get the release date from the cached movie list (this matches the thumbnail)
+                cached_release_date = now_showing.release_date
         except:
             pass
 
@@ -343,20 +763,60 @@ def get_movie_details(movie_id):
             except:
                 pass  # Keep original if parsing fails
 
-        result_data = {
-            "movie": movie,
-            "certification": certification,
-            "cast": cast,
-            "directors": directors,
-            "producers": producers,
-            "writers": writers,
-            "schedule": schedule,
-            "is_now_showing": is_now_showing
-        }
-        
-        # Cache the result
-        cache[f"movie_detail_{movie_id}"] = (result_data, time.time())
-        
+        result_data["movie"] = movie
+        result_data["schedule"] = schedule
+        result_data["is_now_showing"] = is_now_showing
         return result_data
     except Exception as e:
-        raise Exception(f"Error fetching movie details: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Error fetching movie details: {str(e)}")
+
+
+# Server-side search over the cached "now showing" list and coming-soon pages.
+# Updated as lists and details are fetched; SEARCH_SYNC_INTERVAL also picks up
+# entries written by other workers (shared cache) or restored from a snapshot.
+search_index = SearchIndex()
+SEARCH_SYNC_INTERVAL = 5
+SEARCH_MAX_RESULTS = 50
+_search_synced_at = 0.0
+
+
+def cached_people(movie_id):
+    """Return the cast and director names of a movie if its details are cached, else None"""
+    details = cache.peek(f"movie_detail_{movie_id}")
+    return None if details is None else details.cast + details.directors
+
+
+def sync_search_index():
+    """Re-index the cached movie lists, at most once per SEARCH_SYNC_INTERVAL"""
+    global _search_synced_at
+    now = time.monotonic()
+    if now - _search_synced_at < SEARCH_SYNC_INTERVAL:
+        return
+    _search_synced_at = now
+    names = ["now"] + [f"coming_page_{page}" for page in range(1, COMING_MAX_PAGES + 1)]
+    for name in names:
+        movies = cache.peek(f"movies_{name}")
+        if movies is None and name in ("now", "coming_page_1"):
+            # Never fetched in this cache yet; loading it indexes it via catalog_updated
+            movies = load_movie_list(name)
+        if movies is not None:
+            if name != "now":
+                movies = exclude_now_showing(movies)
+            search_index.update_list(name, movies["results"], cached_people)
+
+
+def search_movies():
+    """
+    Search endpoint: ?q= matches title words (and prefixes), cast and director
+    names; ?genre= limits results to a TMDB genre id.
+    """
+    query = request.args.get("q", "")
+    genre = request.args.get("genre", type=int)
+    limit = max(1, min(request.args.get("limit", 20, type=int), SEARCH_MAX_RESULTS))
+    try:
+        with tmdb_client.deadline(REQUEST_DEADLINE):
+            sync_search_index()
+        results = search_index.search(query, genre_id=genre, limit=limit)
+        return jsonify({"query": query, "results": [movie.to_dict() for movie in results]})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -1,9 +1,12 @@
-from flask import Flask, render_template, jsonify, session, request, redirect, url_for
+from flask import Flask, render_template, stream_template, jsonify, session, request, redirect, url_for
+from jinja2 import FileSystemBytecodeCache
 from livereload import Server
 from dotenv import load_dotenv
+from page_cache import PageCache
 import api
 import auth
 import database
+import db_pool
 import scanner
 import os
 import traceback
@@ -15,35 +18,55 @@ from call_php import run_php_script
 
 load_dotenv()
 app = Flask(__name__)
-app.config["TEMPLATES_AUTO_RELOAD"] = True
+# Render sets FLASK_ENV=production; anything else is local development
+DEBUG = os.getenv("FLASK_ENV", "development") != "production"
+# Re-check templates on disk only while developing
+app.config["TEMPLATES_AUTO_RELOAD"] = DEBUG
+if not DEBUG:
+    # Share compiled templates between workers and restarts instead of recompiling them
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(os.getenv("TEMPLATE_CACHE_DIR") or None)
 # Generate new secret key on each startup to auto-logout all sessions (including screen mode)
 # This ensures screen users must re-login after server restart
 import secrets
 app.config["SECRET_KEY"] = secrets.token_hex(32)
-app.debug = True
+app.debug = DEBUG
+
+# Rendered pages and navbar/footer/FAQ fragments (off in debug so template edits show up)
+# Movie pages also depend on TMDB data, so they expire after PAGE_CACHE_TTL seconds
+PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", "300"))
+pages = PageCache(enabled=not DEBUG, ttls={"pages/detail.html": PAGE_CACHE_TTL})
+app.jinja_env.globals["fragment"] = pages.fragment
+
+
+def login_state():
+    """The session values the shared templates (navbar, welcome text) depend on"""
+    return (session.get('username'), bool(session.get('is_admin')))
+
+
+def cached_page(template):
+    """Render a page that only depends on the login state, from memory when possible"""
+    username = session.get('username')
+    return app.response_class(pages.render(template, vary=login_state(), username=username))
+
 
 @app.route("/")
 def home():
-    username = session.get('username')
-    return render_template("pages/index.html", username=username)
+    return cached_page("pages/index.html")
 
 
 @app.route("/about")
 def about():
-    username = session.get('username')
-    return render_template("pages/about.html", username=username)
+    return cached_page("pages/about.html")
 
 
 @app.route("/contact")
 def contact():
-    username = session.get('username')
-    return render_template("pages/contact.html", username=username)
+    return cached_page("pages/contact.html")
 
 
 @app.route("/landing")
 def landing():
-    username = session.get('username')
-    return render_template("pages/landing.html", username=username)
+    return cached_page("pages/landing.html")
 
 
 @app.route("/api/genres")
@@ -56,21 +79,94 @@ def movies_route(movie_type):
     return api.get_movies(movie_type)
 
 
+@app.route("/api/search")
+def search_route():
+    return api.search_movies()
+
+
 @app.route("/api/movie/<int:movie_id>/schedule")
 def movie_schedule(movie_id):
     return api.get_movie_schedule_api(movie_id)
 
 
+@app.route("/api/showtimes")
+def showtimes_route():
+    return api.get_showtimes_api()
+
+
+# Size of the writes a streamed page is batched into once its data has loaded
+STREAM_CHUNK_BYTES = 8192
+
+
+def batch_stream(chunks, loaded, on_complete=None):
+    """
+    Pass template chunks through one by one until loaded() is true (so the
+    layout reaches the browser before a slow load starts), then join the rest
+    into STREAM_CHUNK_BYTES writes instead of hundreds of tiny ones.
+    on_complete(html), if given, receives the whole page once it has been sent.
+    """
+    sent = []
+    buffer = []
+    buffered = 0
+    for chunk in chunks:
+        if not loaded():
+            sent.append(chunk)
+            yield chunk
+            continue
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= STREAM_CHUNK_BYTES:
+            sent.append("".join(buffer))
+            yield sent[-1]
+            buffer = []
+            buffered = 0
+    if buffer:
+        sent.append("".join(buffer))
+        yield sent[-1]
+    if on_complete is not None:
+        on_complete("".join(sent))
+
+
 @app.route("/movie/<int:movie_id>")
 def movie_detail(movie_id):
-    try:
-        username = session.get('username')
-        email = session.get('email', 'guest@reeliz.com')
-        movie_data = api.get_movie_details(movie_id)
-        return render_template("pages/detail.html", username=username, email=email, **movie_data)
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    
+    """
+    Stream the detail page: the layout (head, navbar, styles) is sent right away
+    and the movie sections follow once load_details() returns, so the time to
+    first byte doesn't depend on TMDB.
+    """
+    username = session.get('username')
+    email = session.get('email', 'guest@reeliz.com')
+    # The page shows the movie's schedule, so a new showtime calendar invalidates it
+    calendar = api.get_showtime_calendar()
+    key = pages.key("page", "pages/detail.html", movie_id, email, *login_state())
+    body = pages.get(key, calendar)
+    if body is not None:
+        return app.response_class(body)
+
+    loaded = []
+
+    def load_details():
+        # Called from the template after the layout has been flushed
+        details = None
+        try:
+            details = api.get_movie_details(movie_id)
+        except Exception as e:
+            print(f"Error loading movie {movie_id}: {e}")
+        loaded.append(details)
+        return details
+
+    def store(html):
+        # Pages showing the "Movie unavailable" message aren't cached
+        if loaded and loaded[0] is not None:
+            pages.set(key, html.encode("utf-8"), calendar)
+
+    chunks = stream_template("pages/detail.html", username=username, email=email, load_details=load_details)
+    response = app.response_class(batch_stream(chunks, lambda: bool(loaded), on_complete=store))
+    # Ask reverse proxies not to buffer the streamed page
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     return auth.login()
@@ -269,6 +365,18 @@ def admin_delete_user():
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 
+@app.route('/api/admin/cache-stats')
+def admin_cache_stats():
+    """Get TMDB cache, page cache and database pool counters for admin dashboard"""
+    if not session.get('is_admin'):
+        return jsonify({'status': 'error', 'message': 'Unauthorized'}), 403
+    
+    stats = api.get_cache_stats().get_json()
+    stats["pages"] = pages.stats()
+    stats["db_pool"] = db_pool.stats()
+    return jsonify(stats)
+
+
 @app.route('/api/admin/transactions')
 def admin_get_transactions():
     """Get all transactions for admin dashboard"""
@@ -291,6 +399,8 @@ def admin_create_transaction():
     
     try:
         data = request.json
+        # The PHP handler writes the showtime and seat tables added by database.py's migrations
+        database.ensure_schema()
         output = run_php_script('php/create.php', ['transaction', json.dumps(data)])
         result = json.loads(output)
         return jsonify(result)
@@ -306,6 +416,8 @@ def admin_update_transaction():
     
     try:
         data = request.json
+        # The PHP handler writes the showtime and seat tables added by database.py's migrations
+        database.ensure_schema()
         output = run_php_script('php/update.php', ['transaction', json.dumps(data)])
         result = json.loads(output)
         return jsonify(result)
@@ -356,6 +468,7 @@ def prepare_transaction():
         
         # Format date for database (MM/DD:HH)
         from datetime import datetime
+        time_part = None
         try:
             # Extract date and time from format like "Jan 15 (Mon), 10:00 AM"
             date_part = selected_date.split(',')[0].strip()  # "Jan 15 (Mon)"
@@ -385,6 +498,23 @@ def prepare_transaction():
             # Fallback to current date/time
             db_date = database.format_datetime_for_db()
         
+        # The page only offers screenings that are on; make sure the request matches one
+        try:
+            movie_id = int(data.get('movieId'))
+        except (TypeError, ValueError):
+            movie_id = None
+        calendar = api.get_showtime_calendar()
+        movie = calendar.movie(movie_id)
+        if movie is not None:
+            showtime = database.parse_showtime(db_date)
+            if (showtime is None or not cinema_room.isdigit()
+                    or not calendar.has_showtime(movie_id, showtime.date().isoformat(), time_part, cinema_room)):
+                return jsonify({
+                    'success': False,
+                    'message': f'{movie.title} is not screening in Cinema {cinema_room} at {time_part}. '
+                               f'Please choose another cinema or time.'
+                }), 400
+        
         # Get next transaction ID
         success, next_id, _ = database.get_next_transaction_id()
         
@@ -704,18 +834,29 @@ def send_ticket_email():
         return jsonify({"success": False, "message": str(e)}), 500
 
 def preload_movie_cache():
-    """Preload movie data in background to speed up first page load"""
+    """Preload movie data in background to speed up first page load, then keep it warm"""
     import threading
+    import time
+    # Touching the lists periodically lets stale entries refresh in the background
+    # instead of making a visitor wait for TMDB once they expire
+    warm_interval = int(os.getenv('CACHE_WARM_INTERVAL', '300'))
+
     def load_cache():
-        try:
-            print("[CACHE] Preloading movie data...")
-            # This will trigger the cache to be populated
-            api.get_movies("now")
-            api.get_movies("coming")
-            api.get_genres()
-            print("[CACHE] ✓ Movie data preloaded successfully!")
-        except Exception as e:
-            print(f"[CACHE] Warning: Failed to preload cache: {e}")
+        preloaded = False
+        while True:
+            try:
+                if not preloaded:
+                    print("[CACHE] Preloading movie data...")
+                # This will trigger the cache to be populated (or refreshed if stale)
+                api.load_movies("now")
+                api.load_movies("coming")
+                api.load_genres()
+                if not preloaded:
+                    print("[CACHE] ✓ Movie data preloaded successfully!")
+                    preloaded = True
+            except Exception as e:
+                print(f"[CACHE] Warning: Failed to preload cache: {e}")
+            time.sleep(warm_interval)
     
     # Run in background thread so it doesn't block startup
     cache_thread = threading.Thread(target=load_cache, daemon=True)
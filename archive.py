@@ -0,0 +1,178 @@
+"""
+Archival of past transactions.
+Moves transactions whose showtime is before today out of the `transaction`
+table into gzip'd JSON lines files, one chunk at a time:
+  1. read the oldest chunk through the showtime index,
+  2. append it to the archive file as its own gzip member and fsync it,
+  3. record the chunk in a checkpoint file,
+  4. delete the chunk in its own short DB transaction.
+If a run stops halfway, the next one cuts off any partly written gzip member
+and finishes deleting the recorded chunk, so nothing is archived twice or lost.
+
+Run from cron with `python archive.py`, or via database.cleanup_old_transactions().
+"""
+import gzip
+import json
+import os
+from datetime import date, datetime
+from mysql.connector import Error
+from dotenv import load_dotenv
+import database
+
+load_dotenv()
+
+# Relative paths are taken from the app directory, so web workers and cron find the same checkpoint
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.getenv('TRANSACTION_ARCHIVE_DIR', '.archive'))
+# Transactions archived and deleted per DB transaction
+ARCHIVE_CHUNK_SIZE = int(os.getenv('TRANSACTION_ARCHIVE_CHUNK_SIZE', '500'))
+CHECKPOINT_FILE = 'checkpoint.json'
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)  # Decimal amounts, bytes...
+
+
+def _read_checkpoint(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_checkpoint(path, checkpoint):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _append_chunk(path, rows):
+    """Append rows to the archive as one gzip member; returns the new file size"""
+    lines = ''.join(json.dumps(row, default=_json_default) + '\n' for row in rows)
+    with open(path, 'ab') as f:
+        f.write(gzip.compress(lines.encode('utf-8')))
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell()
+
+
+def _delete_ids(cursor, connection, ids):
+    """Delete archived rows in their own short transaction; returns the number deleted"""
+    deleted = 0
+    if ids:
+        placeholders = ','.join(['%s'] * len(ids))
+        cursor.execute(f"DELETE FROM transaction WHERE id IN ({placeholders})", ids)
+        deleted = cursor.rowcount
+    connection.commit()
+    return deleted
+
+
+def _resume(cursor, connection, checkpoint):
+    path = checkpoint['archive']
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    if size < checkpoint['size']:
+        raise OSError(f"Archive {path} is shorter than its checkpoint ({size} < {checkpoint['size']} bytes)")
+    if size > checkpoint['size']:
+        # A chunk was being written when the last run stopped; it was never deleted
+        with open(path, 'r+b') as f:
+            f.truncate(checkpoint['size'])
+    # The last archived chunk may still be in the table
+    return _delete_ids(cursor, connection, checkpoint['pending_ids'])
+
+
+def archive_transactions(before=None, chunk_size=ARCHIVE_CHUNK_SIZE, archive_dir=ARCHIVE_DIR):
+    """
+    Archive and delete transactions with a showtime before `before` (default: today 00:00)
+    Only one run at a time per database (MySQL named lock); an interrupted run
+    is resumed, with its original cutoff, by the next call.
+    Returns: tuple (success: bool, archived_count: int)
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    checkpoint_path = os.path.join(archive_dir, CHECKPOINT_FILE)
+
+    connection = database.get_db_connection()
+    if not connection:
+        return False, 0
+    cursor = connection.cursor(dictionary=True)
+    locked = False
+    archived = 0
+
+    try:
+        cursor.execute("SELECT GET_LOCK('reeliz_archive', 0) AS locked")
+        locked = cursor.fetchone()['locked'] == 1
+        if not locked:
+            print("[ARCHIVE] Another archival run is in progress")
+            return True, 0
+
+        checkpoint = _read_checkpoint(checkpoint_path)
+        if checkpoint:
+            print(f"[ARCHIVE] Resuming interrupted run into {checkpoint['archive']}")
+            # Those rows were archived by the interrupted run; don't count them again
+            deleted = _resume(cursor, connection, checkpoint)
+            print(f"[ARCHIVE] Deleted {deleted} transaction(s) left over by the interrupted run")
+        else:
+            cutoff = before or datetime.combine(date.today(), datetime.min.time())
+            checkpoint = {
+                'archive': os.path.join(archive_dir, f"transactions-{datetime.now():%Y%m%d-%H%M%S}.jsonl.gz"),
+                'cutoff': cutoff.isoformat(),
+                'size': 0,
+                'pending_ids': [],
+            }
+            _write_checkpoint(checkpoint_path, checkpoint)
+        cutoff = datetime.fromisoformat(checkpoint['cutoff'])
+
+        while True:
+            # Archived chunks are deleted, so the next chunk is always the oldest rows left
+            cursor.execute(
+                "SELECT * FROM transaction WHERE showtime < %s ORDER BY showtime, id LIMIT %s",
+                (cutoff, chunk_size),
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            checkpoint['size'] = _append_chunk(checkpoint['archive'], rows)
+            checkpoint['pending_ids'] = [row['id'] for row in rows]
+            _write_checkpoint(checkpoint_path, checkpoint)
+            _delete_ids(cursor, connection, checkpoint['pending_ids'])
+            archived += len(rows)
+            print(f"[ARCHIVE] Archived {archived} transaction(s) so far")
+            if len(rows) < chunk_size:
+                break
+
+        connection.commit()
+        os.remove(checkpoint_path)
+        if archived:
+            print(f"[ARCHIVE] ✓ Archived {archived} past transaction(s) to {checkpoint['archive']}")
+        return True, archived
+
+    except (Error, OSError) as e:
+        connection.rollback()
+        print(f"[ARCHIVE] Archival stopped after {archived} transaction(s): {e}")
+        return False, archived
+
+    finally:
+        if locked:
+            try:
+                cursor.execute("SELECT RELEASE_LOCK('reeliz_archive')")
+                cursor.fetchone()
+            except Error:
+                pass
+        cursor.close()
+        connection.close()
+
+
+def read_archive(path):
+    """Yield the transactions stored in an archive file"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+if __name__ == "__main__":
+    success, count = archive_transactions()
+    print(f"Archived {count} transaction(s)" if success else "Archival failed; run again to resume")
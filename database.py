@@ -1,61 +1,335 @@
 import mysql.connector
-from mysql.connector import Error
-from datetime import datetime
+from mysql.connector import Error, errorcode
+from datetime import date, datetime, timedelta
 import os
+import time
+import threading
 from dotenv import load_dotenv
+import db_pool
 
 load_dotenv()
 
-def get_db_connection():
-    """Create and return a database connection"""
-    try:
-        connection = mysql.connector.connect(
-            host=os.getenv('DB_HOST', 'localhost'),
-            user=os.getenv('DB_USER', 'root'),
-            password=os.getenv('DB_PASSWORD', ''),
-            database=os.getenv('DB_NAME', 'reeliz_db')
+# Transaction ids reserved from the database per round trip (see IdAllocator)
+ID_BLOCK_SIZE = int(os.getenv('DB_ID_BLOCK_SIZE', '20'))
+
+# Furthest ahead a showtime can be booked (the booking page offers the next 14 days)
+SHOWTIME_HORIZON_DAYS = 31
+
+# Schema changes, applied in order the first time the app touches the database.
+# Each runs once per database (recorded in schema_migrations); statements are SQL
+# strings or functions taking a cursor, and should be safe to re-run in case a
+# previous attempt stopped halfway.
+MIGRATIONS = [
+    ("001_id_sequence", [
+        # next_id is the next id to hand out; reserved with LAST_INSERT_ID(expr)
+        """
+        CREATE TABLE IF NOT EXISTS id_sequence (
+            name VARCHAR(32) NOT NULL PRIMARY KEY,
+            next_id BIGINT NOT NULL
         )
-        return connection
-    except Error as e:
-        print(f"Error connecting to MySQL: {e}")
-        return None
+        """,
+        """
+        INSERT IGNORE INTO id_sequence (name, next_id)
+        SELECT 'transaction', COALESCE(MAX(id), 0) + 1 FROM transaction
+        """,
+    ]),
+    ("002_transaction_seat", [
+        lambda cursor: _create_transaction_seat(cursor, "VARCHAR(16)"),
+        lambda cursor: _backfill_transaction_seats(cursor, "date"),
+    ]),
+    ("003_transaction_showtime", [
+        lambda cursor: _add_showtime_column(cursor),
+        lambda cursor: _backfill_showtimes(cursor),
+        # Seat rows are derived from transactions: rebuild them keyed by the DATETIME showtime
+        "DROP TABLE IF EXISTS transaction_seat",
+        lambda cursor: _create_transaction_seat(cursor, "DATETIME"),
+        lambda cursor: _backfill_transaction_seats(cursor, "showtime"),
+    ]),
+    # 003 put bookings older than about six months in the next year
+    ("004_redate_future_showtimes", [
+        lambda cursor: _redate_future_showtimes(cursor),
+    ]),
+]
 
-def get_next_transaction_id():
+
+def parse_showtime(date_str, today=None):
     """
-    Get the next transaction ID that will be used
-    Returns: tuple (success: bool, next_id: int or None, barcode: str or None)
+    Turn a stored "MM/DD:HH" booking date into a datetime (None if malformed)
+    The year isn't part of the string. Bookings are at most SHOWTIME_HORIZON_DAYS
+    ahead, so the latest year that doesn't put the date past that is used;
+    older bookings stay in the past.
     """
-    connection = None
-    cursor = None
-    
+    today = today or date.today()
     try:
+        day_part, _, hour = str(date_str).partition(':')
+        month, day = map(int, day_part.split('/'))
+        hour = int(hour or 0)
+    except ValueError:
+        return None
+    latest = today + timedelta(days=SHOWTIME_HORIZON_DAYS)
+    # Going back up to 4 years finds a Feb 29
+    for year in range(today.year + 1, today.year - 5, -1):
+        try:
+            candidate = datetime(year, month, day, hour)
+        except ValueError:
+            continue  # Out of range, or Feb 29 outside a leap year
+        if candidate.date() <= latest:
+            return candidate
+    return None
+
+
+def parse_seats(sits):
+    """Split a "A1, A2, B3" seat list into unique seat codes, in order"""
+    seats = []
+    for seat in str(sits or '').split(','):
+        seat = seat.strip()
+        if seat and seat not in seats:
+            seats.append(seat)
+    return seats
+
+
+def _create_transaction_seat(cursor, showtime_type):
+    # One row per booked seat. The primary key makes a seat bookable once per
+    # showing and answers seat-map queries with a range scan on (movie, room, showtime).
+    # The transaction_id column must match transaction.id exactly for the foreign key.
+    cursor.execute("SHOW COLUMNS FROM transaction LIKE 'id'")
+    id_type = cursor.fetchone()[1]
+    if isinstance(id_type, bytes):
+        id_type = id_type.decode()
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS transaction_seat (
+            movie VARCHAR(255) NOT NULL,
+            room VARCHAR(10) NOT NULL,
+            showtime {showtime_type} NOT NULL,
+            seat VARCHAR(8) NOT NULL,
+            transaction_id {id_type} NOT NULL,
+            PRIMARY KEY (movie, room, showtime, seat),
+            KEY transaction_seat_transaction (transaction_id),
+            CONSTRAINT transaction_seat_transaction_fk FOREIGN KEY (transaction_id)
+                REFERENCES transaction (id) ON DELETE CASCADE
+        )
+    """)
+
+
+def _backfill_transaction_seats(cursor, showtime_column):
+    # Existing bookings; if old data double-booked a seat the earliest transaction keeps it
+    cursor.execute(
+        f"SELECT id, {showtime_column}, room, movie, sits FROM transaction "
+        f"WHERE {showtime_column} IS NOT NULL ORDER BY id"
+    )
+    rows = [
+        (movie, str(room), showtime, seat, transaction_id)
+        for transaction_id, showtime, room, movie, sits in cursor.fetchall()
+        for seat in parse_seats(sits)
+    ]
+    if rows:
+        cursor.executemany(
+            "INSERT IGNORE INTO transaction_seat (movie, room, showtime, seat, transaction_id) VALUES (%s, %s, %s, %s, %s)",
+            rows,
+        )
+        print(f"[DB] Backfilled {cursor.rowcount} of {len(rows)} booked seat(s)")
+
+# Seconds to wait before retrying after a failed migration
+SCHEMA_RETRY_SECONDS = 60
+
+_schema_ready = False
+_schema_failed_at = None
+_schema_lock = threading.Lock()
+
+
+def _add_showtime_column(cursor):
+    cursor.execute("SHOW COLUMNS FROM transaction LIKE 'showtime'")
+    if cursor.fetchone() is None:
+        cursor.execute(
+            "ALTER TABLE transaction ADD COLUMN showtime DATETIME NULL, "
+            "ADD INDEX transaction_showtime (showtime)"
+        )
+
+
+def _backfill_showtimes(cursor):
+    # Rows whose date can't be parsed keep a NULL showtime (and are never cleaned up, as before)
+    cursor.execute("SELECT id, date FROM transaction WHERE showtime IS NULL")
+    rows = [
+        (showtime, transaction_id)
+        for transaction_id, date_str in cursor.fetchall()
+        for showtime in [parse_showtime(date_str)]
+        if showtime is not None
+    ]
+    if rows:
+        cursor.executemany("UPDATE transaction SET showtime = %s WHERE id = %s", rows)
+    print(f"[DB] Backfilled the showtime of {len(rows)} transaction(s)")
+
+
+def _redate_future_showtimes(cursor):
+    cursor.execute(
+        "SELECT id, date FROM transaction WHERE showtime > NOW() + INTERVAL %s DAY",
+        (SHOWTIME_HORIZON_DAYS,),
+    )
+    rows = [(parse_showtime(date_str), transaction_id) for transaction_id, date_str in cursor.fetchall()]
+    if not rows:
+        return
+    cursor.executemany("UPDATE transaction SET showtime = %s WHERE id = %s", rows)
+    # Their seats move with them
+    ids = [transaction_id for _, transaction_id in rows]
+    placeholders = ','.join(['%s'] * len(ids))
+    cursor.execute(f"DELETE FROM transaction_seat WHERE transaction_id IN ({placeholders})", ids)
+    cursor.execute(
+        f"SELECT id, showtime, room, movie, sits FROM transaction "
+        f"WHERE id IN ({placeholders}) AND showtime IS NOT NULL",
+        ids,
+    )
+    seats = [
+        (movie, str(room), showtime, seat, transaction_id)
+        for transaction_id, showtime, room, movie, sits in cursor.fetchall()
+        for seat in parse_seats(sits)
+    ]
+    if seats:
+        cursor.executemany(
+            "INSERT IGNORE INTO transaction_seat (movie, room, showtime, seat, transaction_id) VALUES (%s, %s, %s, %s, %s)",
+            seats,
+        )
+    print(f"[DB] Moved {len(rows)} transaction(s) misdated into the future back to their past showtime")
+
+
+def ensure_schema():
+    """
+    Apply pending MIGRATIONS once per process
+    A MySQL named lock keeps several workers from migrating at the same time.
+    After a failure, calls return False without retrying for SCHEMA_RETRY_SECONDS.
+    Returns True when the schema is up to date.
+    """
+    global _schema_ready, _schema_failed_at
+    if _schema_ready:
+        return True
+    with _schema_lock:
+        if _schema_ready:
+            return True
+        if _schema_failed_at is not None and time.monotonic() - _schema_failed_at < SCHEMA_RETRY_SECONDS:
+            return False
+        connection = db_pool.get_connection()
+        if not connection:
+            return False
+        cursor = connection.cursor()
+        locked = False
+        try:
+            cursor.execute("SELECT GET_LOCK('reeliz_schema', 30)")
+            locked = cursor.fetchone()[0] == 1
+            if not locked:
+                raise Error("Timed out waiting for another worker's migration lock")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    name VARCHAR(64) NOT NULL PRIMARY KEY,
+                    applied_at DATETIME NOT NULL
+                )
+            """)
+            cursor.execute("SELECT name FROM schema_migrations")
+            applied = {row[0] for row in cursor.fetchall()}
+            for name, statements in MIGRATIONS:
+                if name in applied:
+                    continue
+                print(f"[DB] Applying migration {name}...")
+                for statement in statements:
+                    if callable(statement):
+                        statement(cursor)
+                    else:
+                        cursor.execute(statement)
+                cursor.execute("INSERT INTO schema_migrations (name, applied_at) VALUES (%s, NOW())", (name,))
+                connection.commit()
+                print(f"[DB] ✓ Migration {name} applied")
+            _schema_ready = True
+            _schema_failed_at = None
+            return True
+        except Error as e:
+            connection.rollback()
+            _schema_failed_at = time.monotonic()
+            print(f"[DB] Schema migration failed, retrying in {SCHEMA_RETRY_SECONDS}s: {e}")
+            return False
+        finally:
+            if locked:
+                try:
+                    cursor.execute("SELECT RELEASE_LOCK('reeliz_schema')")
+                    cursor.fetchone()
+                except Error:
+                    pass
+            cursor.close()
+            connection.close()
+
+
+def get_db_connection():
+    """
+    Check out a pooled database connection (None if the database is unreachable)
+    Calling close() on it returns it to the pool.
+    """
+    ensure_schema()
+    return db_pool.get_connection()
+
+
+class IdAllocator:
+    """
+    Hands out unique ids from a row of the id_sequence table
+    Ids are reserved block_size at a time with a single UPDATE, so most calls
+    never touch the database. Ids of a block that is never used (e.g. on
+    restart, or a checkout that is abandoned) are skipped, not reused.
+    """
+
+    def __init__(self, name, block_size=ID_BLOCK_SIZE):
+        self.name = name
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def _reserve(self):
         connection = get_db_connection()
         if not connection:
-            return False, None, None
-        
+            raise Error("Failed to connect to database")
         cursor = connection.cursor()
-        
-        # Get the latest ID from the transaction table
-        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM transaction")
-        result = cursor.fetchone()
-        latest_id = result[0] if result else 0
-        next_id = latest_id + 1
-        
-        print(f"Latest ID in database: {latest_id}, Next ID will be: {next_id}")
-        
+        try:
+            cursor.execute(
+                "UPDATE id_sequence SET next_id = LAST_INSERT_ID(next_id + %s) WHERE name = %s",
+                (self.block_size, self.name),
+            )
+            if cursor.rowcount != 1:
+                raise Error(f"No id_sequence row for '{self.name}'")
+            end = cursor.lastrowid
+            if not end:
+                cursor.execute("SELECT LAST_INSERT_ID()")
+                end = cursor.fetchone()[0]
+            connection.commit()
+        except Error:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+        self._next, self._end = end - self.block_size, end
+
+    def next_id(self):
+        with self._lock:
+            if self._next >= self._end:
+                self._reserve()
+            next_id = self._next
+            self._next += 1
+            return next_id
+
+
+transaction_ids = IdAllocator('transaction')
+
+
+def get_next_transaction_id():
+    """
+    Reserve a unique transaction ID (embedded in the barcode before the insert)
+    Returns: tuple (success: bool, next_id: int or None, barcode: str or None)
+    """
+    try:
+        next_id = transaction_ids.next_id()
+        print(f"Reserved transaction ID: {next_id}")
         return True, next_id, None
-        
     except Error as e:
         print(f"Database error in get_next_transaction_id: {e}")
         import traceback
         traceback.print_exc()
         return False, None, None
-        
-    finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
 
 def insert_transaction_with_barcode(transaction_id, date, name, room, movie, sits, amount, barcode, remarks='Active'):
     """
@@ -87,13 +361,37 @@ def insert_transaction_with_barcode(transaction_id, date, name, room, movie, sit
         barcode_str = str(barcode)
         remarks_str = str(remarks)
         
+        showtime = parse_showtime(date_str)
+        if showtime is None:
+            return False, f"Invalid booking date: {date_str}"
+        
         # Insert the complete transaction with explicit ID and barcode
         insert_query = """
-        INSERT INTO transaction (id, date, name, room, movie, sits, amount, barcode, remarks)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        INSERT INTO transaction (id, date, showtime, name, room, movie, sits, amount, barcode, remarks)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         """
         
-        cursor.execute(insert_query, (transaction_id, date_str, name_str, room_str, movie_str, sits_str, amount_str, barcode_str, remarks_str))
+        cursor.execute(insert_query, (transaction_id, date_str, showtime, name_str, room_str, movie_str, sits_str, amount_str, barcode_str, remarks_str))
+        
+        # Book each seat in the same DB transaction; the unique key rejects seats someone else already has
+        seats = parse_seats(sits_str)
+        try:
+            cursor.executemany(
+                "INSERT INTO transaction_seat (movie, room, showtime, seat, transaction_id) VALUES (%s, %s, %s, %s, %s)",
+                [(movie_str, room_str, showtime, seat, transaction_id) for seat in seats],
+            )
+        except mysql.connector.IntegrityError as e:
+            connection.rollback()
+            if e.errno != errorcode.ER_DUP_ENTRY:
+                raise
+            cursor.execute(
+                "SELECT seat FROM transaction_seat WHERE movie = %s AND room = %s AND showtime = %s",
+                (movie_str, room_str, showtime),
+            )
+            taken = {row[0] for row in cursor.fetchall()}
+            conflicts = [seat for seat in seats if seat in taken]
+            print(f"✗ Seats already booked for transaction {transaction_id}: {conflicts}")
+            return False, f"Seat(s) {', '.join(conflicts)} were just booked by someone else. Please choose other seats."
         connection.commit()
         
         print(f"✓ Transaction inserted successfully with ID: {transaction_id}")
@@ -121,82 +419,19 @@ def insert_transaction_with_barcode(transaction_id, date, name, room, movie, sit
     finally:
         if cursor:
             cursor.close()
-        if connection and connection.is_connected():
+        if connection:
             connection.close()
 
 def cleanup_old_transactions():
     """
-    Delete transactions ONLY from dates before today (past dates only)
-    This preserves advance bookings (future dates) and keeps current day bookings
-    Returns: tuple (success: bool, deleted_count: int)
+    Move transactions from dates before today out of the transaction table
+    This preserves advance bookings (future dates) and keeps current day bookings.
+    Past rows are archived to disk chunk by chunk before being deleted (see archive.py);
+    their seat rows go with them (ON DELETE CASCADE).
+    Returns: tuple (success: bool, archived_count: int)
     """
-    connection = None
-    cursor = None
-    
-    try:
-        connection = get_db_connection()
-        if not connection:
-            return False, 0
-        
-        cursor = connection.cursor()
-        
-        # Get today's date in MM/DD format
-        today = datetime.now()
-        today_month = int(today.strftime("%m"))
-        today_day = int(today.strftime("%d"))
-        
-        print(f"Cleaning up transactions from PAST dates only (before {today.strftime('%m/%d')})...")
-        
-        # Get all transactions to check dates
-        cursor.execute("SELECT id, date FROM transaction")
-        all_transactions = cursor.fetchall()
-        
-        ids_to_delete = []
-        for trans_id, trans_date in all_transactions:
-            # Extract MM/DD from format "MM/DD:HH"
-            date_part = trans_date.split(':')[0] if ':' in trans_date else trans_date
-            
-            try:
-                trans_month, trans_day = map(int, date_part.split('/'))
-                
-                # Delete only if transaction date is BEFORE today
-                # Compare: if trans_month < today_month OR (same month but trans_day < today_day)
-                is_past = False
-                if trans_month < today_month:
-                    is_past = True
-                elif trans_month == today_month and trans_day < today_day:
-                    is_past = True
-                
-                if is_past:
-                    ids_to_delete.append(trans_id)
-                    
-            except ValueError:
-                # Invalid date format, skip
-                continue
-        
-        # Delete past transactions
-        deleted_count = 0
-        if ids_to_delete:
-            placeholders = ','.join(['%s'] * len(ids_to_delete))
-            delete_query = f"DELETE FROM transaction WHERE id IN ({placeholders})"
-            cursor.execute(delete_query, ids_to_delete)
-            connection.commit()
-            deleted_count = len(ids_to_delete)
-        
-        print(f"✓ Deleted {deleted_count} past transaction(s) (keeping today and future bookings)")
-        return True, deleted_count
-        
-    except Error as e:
-        if connection:
-            connection.rollback()
-        print(f"Database error in cleanup_old_transactions: {e}")
-        return False, 0
-        
-    finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
+    import archive
+    return archive.archive_transactions()
 
 def get_occupied_seats(movie_title, cinema_room, selected_date=None):
     """
@@ -220,36 +455,29 @@ def get_occupied_seats(movie_title, cinema_room, selected_date=None):
         
         cursor = connection.cursor()
         
-        # Query to get seats for matching movie, room, and optionally date
+        # Seat rows for the movie and room, optionally limited to one date;
+        # an index range scan on the (movie, room, showtime, seat) key
         if selected_date:
-            # Filter by specific date (MM/DD format from database)
+            # Every showtime on that day
+            day_start = parse_showtime(f"{selected_date}:00")
+            if day_start is None:
+                return []
             query = """
-            SELECT sits FROM transaction 
-            WHERE movie = %s AND room = %s AND date LIKE %s
+            SELECT seat FROM transaction_seat 
+            WHERE movie = %s AND room = %s AND showtime >= %s AND showtime < %s
             """
-            # Match date pattern: MM/DD:HH -> we only match MM/DD part
-            date_pattern = f"{selected_date}%"
-            cursor.execute(query, (movie_title, cinema_room, date_pattern))
+            cursor.execute(query, (movie_title, str(cinema_room), day_start, day_start + timedelta(days=1)))
             print(f"Querying occupied seats for '{movie_title}' in Cinema {cinema_room} on {selected_date}")
         else:
             # Get all dates
             query = """
-            SELECT sits FROM transaction 
+            SELECT seat FROM transaction_seat 
             WHERE movie = %s AND room = %s
             """
-            cursor.execute(query, (movie_title, cinema_room))
+            cursor.execute(query, (movie_title, str(cinema_room)))
             print(f"Querying occupied seats for '{movie_title}' in Cinema {cinema_room} (all dates)")
         
-        results = cursor.fetchall()
-        
-        # Collect all seats from all matching transactions
-        occupied_seats = []
-        for row in results:
-            sits_str = row[0]  # Format: "A1, A2, B3" or "A3, A4, A6"
-            if sits_str:
-                # Split by comma and strip whitespace
-                seats = [seat.strip() for seat in sits_str.split(',')]
-                occupied_seats.extend(seats)
+        occupied_seats = [row[0] for row in cursor.fetchall()]
         
         print(f"Occupied seats found: {occupied_seats}")
         return occupied_seats
@@ -261,7 +489,7 @@ def get_occupied_seats(movie_title, cinema_room, selected_date=None):
     finally:
         if cursor:
             cursor.close()
-        if connection and connection.is_connected():
+        if connection:
             connection.close()
 
 def format_datetime_for_db():
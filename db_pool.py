@@ -0,0 +1,248 @@
+"""
+Shared MySQL connection pool for the web request paths (database.py and
+scanner.py's web API functions).
+Connections are opened once and reused: checkout hands out an idle
+connection (pinging it first if it sat idle for a while), close() gives it
+back. Up to DB_POOL_SIZE connections are kept; DB_POOL_OVERFLOW more can be
+opened under load and are closed when returned. Connections older than
+DB_POOL_RECYCLE seconds are replaced so the server's wait_timeout never
+bites.
+"""
+import os
+import threading
+import time
+from collections import deque
+import mysql.connector
+from dotenv import load_dotenv
+
+load_dotenv()
+
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+POOL_OVERFLOW = int(os.getenv("DB_POOL_OVERFLOW", "5"))
+# Seconds a request waits for a free connection before giving up
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+POOL_RECYCLE = float(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Idle connections older than this are pinged on checkout (0 = always)
+POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", "10"))
+
+
+class PoolTimeout(mysql.connector.Error):
+    """No connection became free within the pool timeout"""
+
+
+def connect_config():
+    """MySQL connection settings from the environment"""
+    return {
+        "host": os.getenv('DB_HOST', 'localhost'),
+        "user": os.getenv('DB_USER', 'root'),
+        "password": os.getenv('DB_PASSWORD', ''),
+        "database": os.getenv('DB_NAME', 'reeliz_db'),
+    }
+
+
+class PooledConnection:
+    """
+    A pool checkout; behaves like the MySQL connection it wraps
+    close() returns the connection to the pool (rolling back anything left
+    uncommitted) instead of disconnecting.
+    """
+
+    def __init__(self, pool, connection, created):
+        self._pool = pool
+        self._connection = connection
+        self._created = created
+
+    def __getattr__(self, name):
+        if self._connection is None:
+            raise mysql.connector.Error("Connection already returned to the pool")
+        return getattr(self._connection, name)
+
+    def is_connected(self):
+        # Health is checked on checkout; a checked-out connection counts as connected
+        return self._connection is not None
+
+    def close(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            self._pool._release(connection, self._created)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    """Thread-safe pool of MySQL connections with checkout wait/utilization stats"""
+
+    def __init__(self, config, size=POOL_SIZE, overflow=POOL_OVERFLOW, timeout=POOL_TIMEOUT,
+                 recycle=POOL_RECYCLE, ping_after=POOL_PING_AFTER, connect=None):
+        self.config = config
+        self.size = size
+        self.overflow = overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+        self._connect = connect or mysql.connector.connect
+        self._idle = deque()  # (connection, created, returned_at), most recently returned last
+        self._open = 0  # connections checked out or idle
+        self._cond = threading.Condition()
+        # Stats
+        self.checkouts = 0
+        self.created = 0
+        self.recycled = 0
+        self.failed_checks = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.peak_in_use = 0
+
+    def _in_use(self):
+        return self._open - len(self._idle)
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _healthy(self, connection, returned_at):
+        if time.time() - returned_at < self.ping_after:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Exception as e:
+            print(f"[DB] Dropping dead pooled connection: {e}")
+            with self._cond:
+                self.failed_checks += 1
+            return False
+
+    def connection(self):
+        """
+        Check out a connection (a PooledConnection; call close() when done)
+        Raises PoolTimeout if none frees up in time, or the connect error.
+        """
+        start = time.monotonic()
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    connection, created, returned_at = self._idle.pop()
+                    break
+                if self._open < self.size + self.overflow:
+                    connection = None
+                    self._open += 1
+                    break
+                remaining = self.timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(f"No database connection free after {self.timeout}s")
+                waited = True
+                self._cond.wait(remaining)
+
+            self.checkouts += 1
+            if waited:
+                wait = time.monotonic() - start
+                self.waits += 1
+                self.wait_time += wait
+                self.max_wait = max(self.max_wait, wait)
+            self.peak_in_use = max(self.peak_in_use, self._in_use())
+
+        now = time.time()
+        if connection is not None:
+            if now - created < self.recycle and self._healthy(connection, returned_at):
+                return PooledConnection(self, connection, created)
+            if now - created >= self.recycle:
+                with self._cond:
+                    self.recycled += 1
+            self._discard(connection)
+
+        # Open a new connection in this (already counted) slot
+        try:
+            connection = self._connect(**self.config)
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.created += 1
+        return PooledConnection(self, connection, time.time())
+
+    def _release(self, connection, created):
+        keep = True
+        try:
+            if connection.in_transaction:
+                # Don't hand the next request an open transaction (or its stale snapshot)
+                connection.rollback()
+        except Exception:
+            keep = False
+        with self._cond:
+            if keep and len(self._idle) < self.size and time.time() - created < self.recycle:
+                self._idle.append((connection, created, time.time()))
+                connection = None
+            else:
+                self._open -= 1
+            self._cond.notify()
+        if connection is not None:
+            self._discard(connection)
+
+    def close_all(self):
+        """Close every idle connection (checked-out ones close when returned)"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for connection, _, _ in idle:
+            self._discard(connection)
+
+    def stats(self):
+        with self._cond:
+            in_use = self._in_use()
+            return {
+                "size": self.size,
+                "overflow": self.overflow,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": in_use,
+                "peak_in_use": self.peak_in_use,
+                "utilization": round(in_use / (self.size + self.overflow), 3),
+                "checkouts": self.checkouts,
+                "created": self.created,
+                "recycled": self.recycled,
+                "failed_checks": self.failed_checks,
+                "timeouts": self.timeouts,
+                "waits": self.waits,
+                "avg_wait_ms": round(self.wait_time / self.waits * 1000, 2) if self.waits else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """The process-wide pool, created on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(connect_config())
+        return _pool
+
+
+def get_connection():
+    """Check out a pooled connection, or return None (and log) if the database can't be reached"""
+    try:
+        return get_pool().connection()
+    except mysql.connector.Error as e:
+        print(f"Error connecting to MySQL: {e}")
+        return None
+
+
+def stats():
+    return get_pool().stats()
@@ -0,0 +1,102 @@
+"""
+Compact records for the movie data we cache.
+TMDB objects carry far more than the site shows (overviews on list entries,
+backdrops, vote counts, full cast and crew lists...). These classes keep only
+the fields the pages and the booking flow use, in __slots__ so each cached
+movie costs a fraction of the raw dict.
+"""
+from tmdb_cache import record_type
+
+# Crew jobs shown on the detail page (and required by has_complete_details)
+CREW_JOBS = ("Director", "Producer", "Writer", "Screenplay", "Story")
+# Top-billed cast members kept per movie (the detail page shows 5)
+CAST_LIMIT = 10
+# Countries whose certification is shown as the age rating
+CERTIFICATION_COUNTRIES = ("PH", "US")
+
+
+class Record:
+    """Base class for __slots__ records with dict conversion and field projection"""
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a record from a TMDB object or a to_dict() result; other keys are dropped"""
+        return cls(**{name: data.get(name) for name in cls.__slots__})
+
+    def to_dict(self, fields=None):
+        """Return the record as a dict, limited to `fields` when given"""
+        names = self.__slots__ if fields is None else [name for name in fields if name in self.__slots__]
+        return {name: getattr(self, name) for name in names}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+@record_type
+class MovieSummary(Record):
+    """A movie in the "now showing" / "coming soon" lists"""
+    __slots__ = ("id", "title", "poster_path", "genre_ids", "release_date", "is_now_showing", "schedule")
+
+
+@record_type
+class MovieDetail(Record):
+    """The TMDB movie fields shown on the detail page"""
+    __slots__ = ("id", "title", "poster_path", "release_date", "runtime", "genres", "overview", "vote_average")
+
+    @classmethod
+    def from_dict(cls, data):
+        record = super().from_dict(data)
+        # Only the names are displayed
+        record.genres = [{"id": genre.get("id"), "name": genre.get("name")} for genre in record.genres or []]
+        return record
+
+
+@record_type
+class MovieDetails(Record):
+    """Everything cached for a movie's detail page"""
+    __slots__ = ("movie", "certification", "cast", "directors", "producers", "writers")
+
+    @classmethod
+    def from_dict(cls, data):
+        record = super().from_dict(data)
+        if isinstance(record.movie, dict):
+            record.movie = MovieDetail.from_dict(record.movie)
+        return record
+
+
+def compact_credits(credits):
+    """Trim a TMDB credits object to the top-billed cast and the crew jobs we show"""
+    return {
+        "cast": [{"name": member["name"]} for member in credits.get("cast", [])[:CAST_LIMIT]],
+        "crew": [
+            {"name": member["name"], "job": member["job"]}
+            for member in credits.get("crew", [])
+            if member.get("job") in CREW_JOBS
+        ],
+    }
+
+
+def compact_release_dates(releases):
+    """Trim a TMDB release_dates object to the certifications we show"""
+    return {
+        "results": [
+            {
+                "iso_3166_1": country["iso_3166_1"],
+                "release_dates": [
+                    {"certification": release["certification"]}
+                    for release in country.get("release_dates", [])
+                    if release.get("certification")
+                ],
+            }
+            for country in releases.get("results", [])
+            if country.get("iso_3166_1") in CERTIFICATION_COUNTRIES
+        ]
+    }
@@ -0,0 +1,73 @@
+"""
+Rendered page and fragment caching for the Jinja templates.
+Pages are cached as encoded HTML, keyed by template, the values they vary on
+(movie id, login state) and an optional version object; a cached page is only
+served while its version is still the current one. Fragments (navbar, footer,
+FAQ) are cached the same way so pages that miss still skip re-rendering them.
+"""
+from flask import render_template
+from markupsafe import Markup
+from tmdb_cache import TTLCache
+
+
+class PageCache:
+    """
+    In-memory cache of rendered templates
+    ttls maps template names to seconds; other templates are kept for
+    default_ttl. With enabled=False (debug) everything is rendered every time.
+    """
+
+    def __init__(self, enabled=True, ttls=None, default_ttl=24 * 3600, max_entries=1000,
+                 max_bytes=32 * 1024 * 1024):
+        self.enabled = enabled
+        self.store = TTLCache(
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+            default_ttl=default_ttl,
+            ttls={f"page:{name}:": ttl for name, ttl in (ttls or {}).items()},
+        )
+
+    @staticmethod
+    def key(kind, template, *vary):
+        return ":".join([kind, template] + [repr(part) for part in vary])
+
+    def get(self, key, version=None):
+        """Return the cached body for key, or None if missing, expired or of another version"""
+        if not self.enabled:
+            return None
+        cached = self.store.get(key)
+        if cached is None or cached[0] is not version:
+            return None
+        return cached[1]
+
+    def set(self, key, body, version=None):
+        if self.enabled:
+            self.store.set(key, (version, body))
+        return body
+
+    def render(self, template, vary=(), version=None, **context):
+        """Render a page template, or return its cached HTML (as bytes)"""
+        key = self.key("page", template, *vary)
+        body = self.get(key, version)
+        if body is None:
+            body = self.set(key, render_template(template, **context).encode("utf-8"), version)
+        return body
+
+    def fragment(self, template, *vary):
+        """
+        Render a component template for inclusion in a page (a Jinja global)
+        vary lists the values the fragment depends on, e.g. the logged-in user.
+        """
+        key = self.key("fragment", template, *vary)
+        html = self.get(key)
+        if html is None:
+            html = self.set(key, Markup(render_template(template)))
+        return html
+
+    def clear(self):
+        self.store.clear()
+
+    def stats(self):
+        stats = self.store.stats()
+        stats["enabled"] = self.enabled
+        return stats
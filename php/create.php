@@ -79,10 +79,40 @@ try {
             sendResponse('error', 'Name and movie are required');
         }
         
-        $stmt = $pdo->prepare("INSERT INTO transaction (date, name, room, movie, sits, amount, barcode, remarks) VALUES (?, ?, ?, ?, ?, ?, ?, ?)");
-        $stmt->execute([$date, $name, $room, $movie, $sits, $amount, $barcode, $remarks]);
+        // Take the id from the sequence the web app reserves booking ids from,
+        // so it can't collide with an id a customer is checking out with
+        $newId = null;
+        try {
+            $stmt = $pdo->prepare("UPDATE id_sequence SET next_id = LAST_INSERT_ID(next_id + 1) WHERE name = 'transaction'");
+            $stmt->execute();
+            if ($stmt->rowCount() > 0) {
+                $newId = $pdo->lastInsertId() - 1;
+            }
+        } catch (PDOException $e) {
+            // Sequence not created yet (the web app creates it on first use)
+        }
+        
+        $pdo->beginTransaction();
+        try {
+            if ($newId !== null) {
+                $stmt = $pdo->prepare("INSERT INTO transaction (id, date, showtime, name, room, movie, sits, amount, barcode, remarks) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)");
+                $stmt->execute([$newId, $date, parseShowtime($date), $name, $room, $movie, $sits, $amount, $barcode, $remarks]);
+            } else {
+                $stmt = $pdo->prepare("INSERT INTO transaction (date, showtime, name, room, movie, sits, amount, barcode, remarks) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)");
+                $stmt->execute([$date, parseShowtime($date), $name, $room, $movie, $sits, $amount, $barcode, $remarks]);
+                $newId = $pdo->lastInsertId();
+            }
+            syncTransactionSeats($pdo, $newId, $date, $room, $movie, $sits);
+            $pdo->commit();
+        } catch (PDOException $e) {
+            $pdo->rollBack();
+            if ($e->getCode() === '23000') {
+                sendResponse('error', 'One or more seats are already booked for this showing');
+            }
+            throw $e;
+        }
         
-        sendResponse('success', 'Transaction created successfully', ['id' => $pdo->lastInsertId()]);
+        sendResponse('success', 'Transaction created successfully', ['id' => $newId]);
         
     } else {
         sendResponse('error', 'Invalid table name');
@@ -11,6 +11,9 @@ $dbname = 'reeliz_db';
 $username = 'root';
 $password = ''; // Default XAMPP password is empty
 
+// Furthest ahead a showtime can be booked (SHOWTIME_HORIZON_DAYS in database.py)
+const SHOWTIME_HORIZON_DAYS = 31;
+
 /**
  * Get PDO database connection
  * @return PDO|null
@@ -48,6 +51,66 @@ function sendResponse($status, $message, $data = null) {
     exit;
 }
 
+/**
+ * Turn a "MM/DD:HH" booking date into a DATETIME string (null if malformed)
+ * The year is the latest that doesn't put the date more than SHOWTIME_HORIZON_DAYS
+ * ahead, like parse_showtime in database.py.
+ * @param string $date
+ * @return string|null
+ */
+function parseShowtime($date) {
+    if (!preg_match('/^(\d{1,2})\/(\d{1,2})(?::(\d{1,2}))?/', (string)$date, $m)) {
+        return null;
+    }
+    $today = new DateTime('today');
+    $latest = (clone $today)->modify('+' . SHOWTIME_HORIZON_DAYS . ' days');
+    $best = null;
+    // Going back up to 4 years finds a Feb 29
+    for ($year = (int)$today->format('Y') + 1; $year >= (int)$today->format('Y') - 4; $year--) {
+        if (!checkdate((int)$m[1], (int)$m[2], $year)) {
+            continue;
+        }
+        $candidate = new DateTime(sprintf('%04d-%02d-%02d', $year, $m[1], $m[2]));
+        if ($candidate <= $latest) {
+            $best = $candidate;
+            break;
+        }
+    }
+    if ($best === null) {
+        return null;
+    }
+    $best->setTime(isset($m[3]) ? (int)$m[3] : 0, 0);
+    return $best->format('Y-m-d H:i:s');
+}
+
+/**
+ * Replace the transaction_seat rows of a transaction with its current seats
+ * Run inside the same DB transaction as the insert/update of the booking.
+ * Throws PDOException (SQLSTATE 23000) if a seat is already booked for that showing.
+ * @param PDO $pdo
+ */
+function syncTransactionSeats($pdo, $id, $date, $room, $movie, $sits) {
+    try {
+        $stmt = $pdo->prepare("DELETE FROM transaction_seat WHERE transaction_id = ?");
+        $stmt->execute([$id]);
+    } catch (PDOException $e) {
+        if ($e->getCode() === '42S02') {
+            return; // Seat table not created yet; the web app backfills it when it does
+        }
+        throw $e;
+    }
+    
+    $showtime = parseShowtime($date);
+    if ($showtime === null) {
+        return; // No showing to book seats in
+    }
+    $seats = array_unique(array_filter(array_map('trim', explode(',', (string)$sits)), 'strlen'));
+    $stmt = $pdo->prepare("INSERT INTO transaction_seat (movie, room, showtime, seat, transaction_id) VALUES (?, ?, ?, ?, ?)");
+    foreach ($seats as $seat) {
+        $stmt->execute([$movie, (string)$room, $showtime, $seat, $id]);
+    }
+}
+
 // Test connection if called directly
 if (basename(__FILE__) == basename($_SERVER['SCRIPT_FILENAME'])) {
     $pdo = getDbConnection();
@@ -82,8 +82,22 @@ try {
             sendResponse('error', 'Transaction ID is required');
         }
         
-        $stmt = $pdo->prepare("UPDATE transaction SET date = ?, name = ?, room = ?, movie = ?, sits = ?, amount = ?, barcode = ?, remarks = ? WHERE id = ?");
-        $stmt->execute([$date, $name, $room, $movie, $sits, $amount, $barcode, $remarks, $id]);
+        $pdo->beginTransaction();
+        try {
+            $stmt = $pdo->prepare("UPDATE transaction SET date = ?, showtime = ?, name = ?, room = ?, movie = ?, sits = ?, amount = ?, barcode = ?, remarks = ? WHERE id = ?");
+            $stmt->execute([$date, parseShowtime($date), $name, $room, $movie, $sits, $amount, $barcode, $remarks, $id]);
+            if ($stmt->rowCount() > 0) {
+                // Keep the seat map in step with the edited booking
+                syncTransactionSeats($pdo, $id, $date, $room, $movie, $sits);
+            }
+            $pdo->commit();
+        } catch (PDOException $e) {
+            $pdo->rollBack();
+            if ($e->getCode() === '23000') {
+                sendResponse('error', 'One or more seats are already booked for this showing');
+            }
+            throw $e;
+        }
         
         if ($stmt->rowCount() > 0) {
             sendResponse('success', 'Transaction updated successfully');
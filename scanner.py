@@ -6,6 +6,7 @@ import os
 from dotenv import load_dotenv
 import threading
 import queue
+import db_pool
 
 load_dotenv()
 
@@ -376,18 +377,8 @@ def stop_scanner_thread():
 # ==============================
 
 def get_db_connection():
-    """Create and return a database connection for web API"""
-    try:
-        connection = mysql.connector.connect(
-            host=os.getenv('DB_HOST', 'localhost'),
-            user=os.getenv('DB_USER', 'root'),
-            password=os.getenv('DB_PASSWORD', ''),
-            database=os.getenv('DB_NAME', 'reeliz_db')
-        )
-        return connection
-    except mysql.connector.Error as e:
-        print(f"Error connecting to MySQL: {e}")
-        return None
+    """Check out a pooled database connection for web API (shared with database.py)"""
+    return db_pool.get_connection()
 
 
 def get_scanner_status():
@@ -481,7 +472,7 @@ def validate_barcode(barcode):
     finally:
         if cursor:
             cursor.close()
-        if connection and connection.is_connected():
+        if connection:
             connection.close()
 
 
@@ -514,7 +505,7 @@ def mark_ticket_as_scanned(barcode):
     finally:
         if cursor:
             cursor.close()
-        if connection and connection.is_connected():
+        if connection:
             connection.close()
 
 
@@ -0,0 +1,228 @@
+"""
+Weekly showtime scheduling for any number of cinema rooms and movies.
+Each day has the same list of start-time slots in every room. The week is
+split into as few sets of weekdays as the movies need, and every room gets
+its own running order on each set of weekdays (a "lane"), so more rooms
+means more movies on screen each day. Each movie is placed in one lane, then
+free slots are filled with other movies of the same weekdays, which then
+also screen in those rooms. A movie longer than one slot (plus cleaning
+time) takes consecutive slots from where it starts, so rooms never have
+overlapping screenings.
+
+With the defaults (2 rooms, 4 slots, 8 movies of normal length) every movie
+screens every day in one of the rooms.
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+# Weekdays numbered like JavaScript's getDay() (0 = Sunday), in the order they
+# are handed out to sets of weekdays
+WEEK = (1, 2, 3, 4, 5, 6, 0)
+
+DEFAULT_SLOTS = ("10:00 AM", "1:00 PM", "4:00 PM", "7:00 PM")
+DEFAULT_CLOSING = "10:00 PM"
+# Minutes kept free after each screening for cleaning and seating
+DEFAULT_CLEANING = 15
+# Assumed runtime when TMDB doesn't know it
+DEFAULT_RUNTIME = 120
+
+
+def time_minutes(time_text):
+    """Minutes after midnight of a display time ("1:00 PM")"""
+    parsed = datetime.strptime(time_text.strip(), "%I:%M %p")
+    return parsed.hour * 60 + parsed.minute
+
+
+class Screening:
+    """One weekly screening: movie, room number, first slot index and slots used"""
+    __slots__ = ("movie_id", "room", "slot", "length")
+
+    def __init__(self, movie_id, room, slot, length):
+        self.movie_id = movie_id
+        self.room = room
+        self.slot = slot
+        self.length = length
+
+
+class WeeklySchedule:
+    """Result of schedule_week(): per-movie weekdays and screenings"""
+
+    def __init__(self, slots, rooms):
+        self.slots = list(slots)
+        self.rooms = list(rooms)
+        self.weekdays = {}  # movie id -> weekdays it screens on
+        self.screenings = {}  # movie id -> [Screening] (one per room at most)
+        self.unscheduled = []  # movie ids that didn't fit anywhere
+
+    def for_movie(self, movie_id):
+        """
+        Return the schedule of one movie in the shape the pages use:
+        allowed_weekdays, time_slots (time_slots[i] is the start in room i + 1,
+        None if the movie isn't on in that room) and all_times.
+        """
+        if movie_id not in self.screenings:
+            return None
+        by_room = {screening.room: self.slots[screening.slot] for screening in self.screenings[movie_id]}
+        return {
+            "allowed_weekdays": self.weekdays[movie_id],
+            "time_slots": [by_room.get(room) for room in self.rooms],
+            "all_times": list(self.slots),  # All available times for display
+        }
+
+
+def _slot_lengths(slots, closing):
+    starts = [time_minutes(slot) for slot in slots]
+    ends = starts[1:] + [time_minutes(closing)]
+    return [end - start for start, end in zip(starts, ends)]
+
+
+def _slots_needed(runtime, lengths, first, cleaning):
+    """Consecutive slots from `first` covering runtime + cleaning, or None if it runs past closing"""
+    needed = (runtime or DEFAULT_RUNTIME) + cleaning
+    for last in range(first, len(lengths)):
+        needed -= lengths[last]
+        if needed <= 0:
+            return last - first + 1
+    return None
+
+
+class _Lane:
+    """The running order of one room on one set of weekdays"""
+    __slots__ = ("room", "days", "next_slot", "screenings")
+
+    def __init__(self, room, days):
+        self.room = room
+        self.days = days  # index of the set of weekdays
+        self.next_slot = 0
+        self.screenings = []
+
+    def add(self, movie_id, length):
+        self.screenings.append(Screening(movie_id, self.room, self.next_slot, length))
+        self.next_slot += length
+
+
+def _place(movies, rooms, day_sets, lengths, cleaning):
+    """
+    Put each movie in one lane, earliest free start first
+    Returns (lanes, placed movie id -> set of weekdays index, movies that didn't fit).
+    """
+    lanes = [_Lane(room, days) for days in range(day_sets) for room in rooms]
+    placed = {}
+    left_over = []
+    for movie_id, runtime in movies:
+        for lane in sorted(lanes, key=lambda lane: lane.next_slot):
+            length = _slots_needed(runtime, lengths, lane.next_slot, cleaning)
+            if length is not None:
+                lane.add(movie_id, length)
+                placed[movie_id] = lane.days
+                break
+        else:
+            left_over.append(movie_id)
+    return lanes, placed, left_over
+
+
+def _fill(lanes, movies, placed, lengths, cleaning):
+    """Fill free slots with movies of the same weekdays that aren't in that room yet"""
+    runtimes = dict(movies)
+    priority = {movie_id: index for index, (movie_id, _) in enumerate(movies)}
+    counts = {movie_id: 1 for movie_id in placed}
+    starts = {movie_id: set() for movie_id in placed}
+    for lane in lanes:
+        for screening in lane.screenings:
+            starts[screening.movie_id].add(screening.slot)
+
+    # One movie per lane per round, so screenings are spread evenly
+    progress = True
+    while progress:
+        progress = False
+        for lane in lanes:
+            if lane.next_slot >= len(lengths):
+                continue
+            showing = {screening.movie_id for screening in lane.screenings}
+            candidates = [
+                movie_id for movie_id, days in placed.items()
+                if days == lane.days and movie_id not in showing
+                and _slots_needed(runtimes[movie_id], lengths, lane.next_slot, cleaning) is not None
+            ]
+            if not candidates:
+                continue
+            # Fewest screenings first, preferring a start time the movie doesn't have yet
+            movie_id = min(candidates, key=lambda movie_id: (
+                counts[movie_id], lane.next_slot in starts[movie_id], priority[movie_id]))
+            starts[movie_id].add(lane.next_slot)
+            counts[movie_id] += 1
+            lane.add(movie_id, _slots_needed(runtimes[movie_id], lengths, lane.next_slot, cleaning))
+            progress = True
+
+
+def schedule_week(movies, rooms=2, slots=DEFAULT_SLOTS, closing=DEFAULT_CLOSING, cleaning=DEFAULT_CLEANING):
+    """
+    Build a conflict-free weekly schedule
+    movies: list of (movie_id, runtime in minutes) in priority order.
+    rooms: number of rooms (numbered from 1).
+    """
+    schedule = WeeklySchedule(slots, range(1, rooms + 1))
+    lengths = _slot_lengths(slots, closing)
+    # Movies longer than a whole day can't screen at all
+    fitting = []
+    for movie_id, runtime in movies:
+        if _slots_needed(runtime, lengths, 0, cleaning) is None:
+            schedule.unscheduled.append(movie_id)
+        else:
+            fitting.append((movie_id, runtime))
+    if not fitting or not schedule.rooms:
+        schedule.unscheduled.extend(movie_id for movie_id, _ in fitting)
+        return schedule
+
+    # The fewer sets of weekdays, the more days each movie screens on. With a
+    # full week's worth, the lowest priority movies that still don't fit are left out.
+    for day_sets in range(1, len(WEEK) + 1):
+        lanes, placed, left_over = _place(fitting, schedule.rooms, day_sets, lengths, cleaning)
+        if not left_over:
+            break
+    schedule.unscheduled.extend(left_over)
+    _fill(lanes, [movie for movie in fitting if movie[0] in placed], placed, lengths, cleaning)
+
+    for lane in lanes:
+        for screening in lane.screenings:
+            schedule.screenings.setdefault(screening.movie_id, []).append(screening)
+    for movie_id, days in placed.items():
+        schedule.weekdays[movie_id] = [day for position, day in enumerate(WEEK) if position % day_sets == days]
+    return schedule
+
+
+class ScheduleCache:
+    """
+    Memoizes schedule_week() by its inputs (the catalog version), so refreshing
+    an unchanged now-showing list doesn't recompute the week.
+    """
+
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.computed = 0
+
+    def get(self, movies, **options):
+        key = (tuple(movies), tuple(sorted(options.items())))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        schedule = schedule_week(list(movies), **options)
+        with self._lock:
+            self._entries[key] = schedule
+            self.computed += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return schedule
+
+
+def parse_slots(text):
+    """Parse a comma separated list of times ("10:00 AM, 1:00 PM") into slot strings"""
+    slots = [slot.strip() for slot in text.split(",") if slot.strip()]
+    for slot in slots:
+        time_minutes(slot)  # Raises ValueError for a malformed time
+    return tuple(sorted(slots, key=time_minutes))
+
@@ -0,0 +1,168 @@
+"""
+In-memory search index over the cached movie catalog.
+Movies are posted under their title words, every prefix of those words (for
+search-as-you-type), their genre ids and the words of their cast and director
+names. The index is updated incrementally: when a list is re-indexed only the
+movies whose data changed are re-posted.
+"""
+import re
+import threading
+import unicodedata
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+# Longest word prefix posted; longer query words fall back to exact matches
+MAX_PREFIX = 15
+
+# Score of one query word matching a movie, by where it matched
+TITLE_WORD_SCORE = 3
+TITLE_PREFIX_SCORE = 2
+PERSON_SCORE = 1
+
+
+def tokenize(text):
+    """Split text into lower-case ASCII words ("Amélie 2" -> ["amelie", "2"])"""
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode("ascii")
+    return WORD_RE.findall(text.lower())
+
+
+def _prefixes(word):
+    return [word[:end] for end in range(1, min(len(word), MAX_PREFIX) + 1)]
+
+
+class SearchIndex:
+    """
+    Inverted index of movie records keyed by catalog list ("now", "coming"...)
+    Thread-safe; lookups only touch the posting sets of the query words.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lists = {}  # list name -> {movie id: movie record}
+        self._docs = {}  # movie id -> movie record currently indexed
+        self._people = {}  # movie id -> tuple of cast/director names
+        self._terms = {}  # movie id -> frozenset of terms it is posted under
+        self._postings = {}  # term -> set of movie ids
+        self.reindexed = 0
+
+    def _terms_for(self, movie_id):
+        movie = self._docs[movie_id]
+        terms = set()
+        for word in tokenize(movie.title):
+            terms.add(("title", word))
+            terms.update(("title_prefix", prefix) for prefix in _prefixes(word))
+        for name in self._people.get(movie_id, ()):
+            for word in tokenize(name):
+                terms.update(("person_prefix", prefix) for prefix in _prefixes(word))
+                terms.add(("person", word))
+        for genre_id in movie.genre_ids or ():
+            terms.add(("genre", genre_id))
+        return frozenset(terms)
+
+    def _reindex(self, movie_id):
+        old = self._terms.pop(movie_id, frozenset())
+        new = self._terms_for(movie_id) if movie_id in self._docs else frozenset()
+        for term in old - new:
+            postings = self._postings[term]
+            postings.discard(movie_id)
+            if not postings:
+                del self._postings[term]
+        for term in new - old:
+            self._postings.setdefault(term, set()).add(movie_id)
+        if new:
+            self._terms[movie_id] = new
+        self.reindexed += 1
+
+    def update_list(self, name, movies, people_for=None):
+        """
+        Make the index reflect the current contents of one catalog list
+        people_for(movie_id), if given, returns the cast/director names of a
+        movie that has none indexed yet (or None if they aren't known).
+        """
+        movies = {movie.id: movie for movie in movies}
+        with self._lock:
+            previous = self._lists.get(name, {})
+            self._lists[name] = movies
+            changed = set()
+            for movie_id, movie in movies.items():
+                if self._docs.get(movie_id) != movie:
+                    self._docs[movie_id] = movie
+                    changed.add(movie_id)
+                if people_for is not None and movie_id not in self._people:
+                    names = people_for(movie_id)
+                    if names:
+                        self._people[movie_id] = tuple(names)
+                        changed.add(movie_id)
+            for movie_id in previous.keys() - movies.keys():
+                if not any(movie_id in listed for listed in self._lists.values()):
+                    del self._docs[movie_id]
+                    self._people.pop(movie_id, None)
+                    changed.add(movie_id)
+            for movie_id in changed:
+                self._reindex(movie_id)
+        return len(changed)
+
+    def update_people(self, movie_id, names):
+        """Index the cast/director names of a catalog movie (ignored for other movies)"""
+        names = tuple(names)
+        with self._lock:
+            if movie_id not in self._docs or self._people.get(movie_id) == names:
+                return
+            self._people[movie_id] = names
+            self._reindex(movie_id)
+
+    def search(self, query, genre_id=None, limit=20):
+        """
+        Return up to limit movie records matching every word of query
+        Title matches rank above cast/director matches; ties go to now-showing
+        movies, then the newest release.
+        """
+        words = tokenize(query)
+        with self._lock:
+            if genre_id is not None:
+                candidates = set(self._postings.get(("genre", genre_id), ()))
+            elif words:
+                candidates = None
+            else:
+                return []
+
+            scores = {}
+            for word in words:
+                exact = self._postings.get(("title", word), set())
+                title = self._postings.get(("title_prefix", word[:MAX_PREFIX]), set())
+                person = self._postings.get(("person_prefix", word[:MAX_PREFIX]), set())
+                if len(word) > MAX_PREFIX:
+                    # Prefix postings stop at MAX_PREFIX; require the whole word for long queries
+                    title = exact
+                    person = self._postings.get(("person", word), set())
+                matched = title | person
+                candidates = matched if candidates is None else candidates & matched
+                if not candidates:
+                    return []
+                for movie_id in candidates:
+                    if movie_id in exact:
+                        score = TITLE_WORD_SCORE
+                    elif movie_id in title:
+                        score = TITLE_PREFIX_SCORE
+                    else:
+                        score = PERSON_SCORE
+                    scores[movie_id] = scores.get(movie_id, 0) + score
+
+            movies = [self._docs[movie_id] for movie_id in candidates]
+
+        # Newest first, then (stable sort) by score and now-showing status
+        movies.sort(key=lambda movie: movie.release_date or "", reverse=True)
+        movies.sort(key=lambda movie: (-scores.get(movie.id, 0), not movie.is_now_showing))
+        return movies[:limit]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._docs)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "movies": len(self._docs),
+                "terms": len(self._postings),
+                "with_people": len(self._people),
+                "reindexed": self.reindexed,
+            }
@@ -0,0 +1,76 @@
+"""
+Materialized showtime calendar.
+Expands the weekly schedule of every now-showing movie into concrete
+showtimes (movie, date, time, room) for a rolling window, indexed by movie
+and by date so lookups never scan the movie list.
+"""
+from datetime import timedelta
+from movie_records import Record
+from scheduler import time_minutes
+
+# Days ahead covered by the calendar (the booking page offers the next 14 days)
+WINDOW_DAYS = 14
+
+
+class Showtime(Record):
+    """One screening: ISO date, display time ("10:00 AM") and cinema room number"""
+    __slots__ = ("movie_id", "date", "time", "room")
+
+
+class ShowtimeCalendar:
+    """
+    Showtimes of the now-showing movies from `start` for `days` days.
+    Each movie's schedule is {"allowed_weekdays": [...], "time_slots": [...]},
+    with weekdays numbered like JavaScript's getDay() (0 = Sunday) and
+    time_slots[i] screening in cinema room i + 1.
+    """
+
+    def __init__(self, movies, start, days=WINDOW_DAYS):
+        self.start = start
+        self.days = days
+        self._movies = {movie.id: movie for movie in movies if movie.schedule}
+        self._by_movie = {movie_id: [] for movie_id in self._movies}
+        self._by_date = {}
+        self._slots = set()
+
+        for offset in range(days):
+            day = start + timedelta(days=offset)
+            date = day.isoformat()
+            weekday = day.isoweekday() % 7
+            showtimes = []
+            for movie_id, movie in self._movies.items():
+                if weekday not in movie.schedule["allowed_weekdays"]:
+                    continue
+                for room, time in enumerate(movie.schedule["time_slots"], start=1):
+                    if time is None:
+                        continue  # Not screening in this room
+                    showtimes.append(Showtime(movie_id=movie_id, date=date, time=time, room=room))
+            showtimes.sort(key=lambda showtime: (time_minutes(showtime.time), showtime.room))
+            self._by_date[date] = showtimes
+            for showtime in showtimes:
+                self._by_movie[showtime.movie_id].append(showtime)
+                self._slots.add((showtime.movie_id, date, showtime.time, showtime.room))
+
+    def movie(self, movie_id):
+        """Return the now-showing MovieSummary for movie_id, or None if it isn't showing"""
+        return self._movies.get(movie_id)
+
+    def schedule(self, movie_id):
+        """Return the weekly schedule of a now-showing movie, or None"""
+        movie = self._movies.get(movie_id)
+        return None if movie is None else movie.schedule
+
+    def for_movie(self, movie_id):
+        """Showtimes of one movie in date/time order"""
+        return self._by_movie.get(movie_id, [])
+
+    def on(self, date):
+        """Showtimes on an ISO date ("2025-01-15") in time order"""
+        return self._by_date.get(date, [])
+
+    def has_showtime(self, movie_id, date, time, room):
+        """Check that a movie really screens at date/time in room (e.g. before booking)"""
+        return (movie_id, date, time, int(room)) in self._slots
+
+    def __len__(self):
+        return len(self._slots)
@@ -38,11 +38,13 @@ document.addEventListener("DOMContentLoaded", () => {
   // Create a wrapper function to call updateTicketInfo with the required parameters
   const update = () => updateTicketInfo(elements, BASE_PRICE);
 
-  // Store occupied seats data for both cinemas
-  const occupiedSeatsCache = {
-    '1': [],
-    '2': []
-  };
+  // Rooms offered in the cinema carousel (only those the movie screens in)
+  const cinemaRooms = Array.from(document.querySelectorAll('#cinemaCarousel .carousel-item'))
+    .map(item => item.getAttribute('data-room'));
+
+  // Store occupied seats data for each cinema
+  const occupiedSeatsCache = {};
+  cinemaRooms.forEach(room => { occupiedSeatsCache[room] = []; });
 
   // Helper function to get selected date in MM/DD format
   function getSelectedDateFormatted() {
@@ -119,9 +121,9 @@ document.addEventListener("DOMContentLoaded", () => {
     console.log(`Applied occupied seats to Cinema ${cinemaRoom} (clearSelections: ${clearSelections})`);
   }
 
-  // Preload occupied seats for both cinemas
+  // Preload occupied seats for every cinema in the carousel
   async function preloadAllOccupiedSeats(clearSelections = false) {
-    console.log('Preloading occupied seats for both cinemas...');
+    console.log('Preloading occupied seats for cinemas', cinemaRooms);
     
     // Show loading spinner, hide carousel
     const loadingSpinner = document.getElementById('seatsLoadingSpinner');
@@ -131,15 +133,11 @@ document.addEventListener("DOMContentLoaded", () => {
     if (carousel) carousel.classList.add('d-none');
     
     try {
-      // Fetch both cinemas in parallel
-      await Promise.all([
-        fetchOccupiedSeats('1'),
-        fetchOccupiedSeats('2')
-      ]);
+      // Fetch all cinemas in parallel
+      await Promise.all(cinemaRooms.map(room => fetchOccupiedSeats(room)));
       
-      // Apply to both cinemas immediately (clear selections if date changed)
-      applyOccupiedSeats('1', clearSelections);
-      applyOccupiedSeats('2', clearSelections);
+      // Apply to all cinemas immediately (clear selections if date changed)
+      cinemaRooms.forEach(room => applyOccupiedSeats(room, clearSelections));
       
       console.log('✅ Occupied seats loaded successfully');
     } catch (error) {
@@ -170,7 +168,7 @@ document.addEventListener("DOMContentLoaded", () => {
     generateDates(updateWithSeats);
   }
 
-  // Preload occupied seats for both cinemas on initial page load (don't clear selections)
+  // Preload occupied seats for all cinemas on initial page load (don't clear selections)
   preloadAllOccupiedSeats(false);
 
   // Handle cinema carousel changes to update time slot and cinema display
@@ -181,25 +179,22 @@ document.addEventListener("DOMContentLoaded", () => {
     // Use 'slide.bs.carousel' instead of 'slid.bs.carousel' to update before transition
     cinemaCarousel.addEventListener('slide.bs.carousel', function (e) {
       const nextSlide = e.relatedTarget;
-      const cinemaNumber = nextSlide.querySelector('[data-cinema]')?.getAttribute('data-cinema');
+      const cinemaNumber = nextSlide.getAttribute('data-room');
+      // Each carousel room is one the movie screens in, at timeSlots[room - 1]
+      const time = cinemaNumber && movieSchedule.timeSlots[parseInt(cinemaNumber) - 1];
       
-      if (cinemaNumber && showtimeSelect) {
-        // Update cinema number display
+      if (time && showtimeSelect) {
+        // Update the cinema number and its time together so they never disagree
         if (cinemaNumberEl) {
           cinemaNumberEl.textContent = cinemaNumber;
         }
-        
-        // Cinema 1 gets the first time slot, Cinema 2 gets the second time slot
-        const timeIndex = parseInt(cinemaNumber) - 1;
-        if (movieSchedule.timeSlots[timeIndex]) {
-          showtimeSelect.value = movieSchedule.timeSlots[timeIndex];
-          // Clear selected seats when changing cinema
-          document.querySelectorAll('.seat.selected').forEach(seat => {
-            seat.classList.remove('selected');
-            seat.classList.add('vacant');
-          });
-          update();
-        }
+        showtimeSelect.value = time;
+        // Clear selected seats when changing cinema
+        document.querySelectorAll('.seat.selected').forEach(seat => {
+          seat.classList.remove('selected');
+          seat.classList.add('vacant');
+        });
+        update();
       }
     });
   }
@@ -674,6 +669,7 @@ if (confirmPaymentBtn) {
       const prepareData = {
         selectedDate: dateTimeEl.textContent,
         cinemaRoom: cinemaNumberEl.textContent,
+        movieId: window.location.pathname.split('/').pop(),
         totalAmount: totalCostPanelEl.textContent
       };
       
@@ -110,7 +110,8 @@ function populateTimeSlots(schedule) {
   showtimeSelect.innerHTML = "";
 
   // Add only the time slots for this movie
-  schedule.timeSlots.forEach((time) => {
+  // Empty entries are rooms the movie doesn't screen in
+  new Set(schedule.timeSlots.filter(Boolean)).forEach((time) => {
     const option = document.createElement("option");
     option.value = time;
     option.textContent = time;
@@ -0,0 +1,860 @@
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Sentinel for "no cached value" so that falsy values (e.g. False) can be cached
+MISSING = object()
+
+# Entry states returned by TTLCache.lookup
+FRESH = "fresh"  # Younger than the soft TTL
+STALE = "stale"  # Past the soft TTL but still servable while it refreshes
+
+# Bump whenever the shape of cached values changes so old snapshots and
+# cache files are discarded
+SNAPSHOT_VERSION = 3
+
+# Returned by a fetch function when the upstream confirmed the cached value is current
+NOT_MODIFIED = object()
+
+
+# Record classes that may be stored in the cache, by name (see record_type)
+RECORD_TYPES = {}
+RECORD_TAG = "__record__"
+
+
+def record_type(cls):
+    """
+    Class decorator allowing instances of cls to be cached
+    The class needs to_dict() and from_dict(). Stored copies are tagged with
+    the class name so loads() can rebuild them; responses get the plain dict.
+    """
+    RECORD_TYPES[cls.__name__] = cls
+    return cls
+
+
+def _tagged_record(obj):
+    if type(obj).__name__ not in RECORD_TYPES:
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    data = obj.to_dict()
+    data[RECORD_TAG] = type(obj).__name__
+    return data
+
+
+def _plain_record(obj):
+    if type(obj).__name__ not in RECORD_TYPES:
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    return obj.to_dict()
+
+
+def _decode_record(data):
+    name = data.pop(RECORD_TAG, None)
+    if name is None:
+        return data
+    if name not in RECORD_TYPES:
+        raise ValueError(f"unknown cached record type {name!r}")
+    return RECORD_TYPES[name].from_dict(data)
+
+
+def dumps(value, tagged=True):
+    """
+    Serialize a cached value to compact JSON bytes
+    tagged=True keeps record types (for storage); tagged=False gives the plain
+    JSON sent to clients.
+    """
+    default = _tagged_record if tagged else _plain_record
+    return json.dumps(value, separators=(",", ":"), default=default).encode("utf-8")
+
+
+def loads(text):
+    """Inverse of dumps(value, tagged=True)"""
+    return json.loads(text, object_hook=_decode_record)
+
+
+class EncodedBody:
+    """
+    Serialized JSON bytes of a cached value, with a content hash for ETags
+    The gzip-compressed variant is produced on first use and then kept.
+    """
+    __slots__ = ("body", "etag", "_gzipped")
+
+    def __init__(self, body):
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self._gzipped = None
+
+    @classmethod
+    def from_value(cls, value):
+        return cls(dumps(value, tagged=False))
+
+    @property
+    def gzipped(self):
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=6)
+        return self._gzipped
+
+
+def estimate_size(obj):
+    """
+    Roughly estimate the memory used by a cached value in bytes
+    Walks dicts, lists, tuples, sets and __slots__ records; good enough for a byte budget
+    """
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += estimate_size(key) + estimate_size(value)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += estimate_size(item)
+    elif type(obj).__name__ in RECORD_TYPES:
+        for name in type(obj).__slots__:
+            size += estimate_size(getattr(obj, name, None))
+    return size
+
+
+class Validated:
+    """A fetched value plus the HTTP validators (ETag / Last-Modified) to store with it"""
+    __slots__ = ("value", "validators")
+
+    def __init__(self, value, validators=None):
+        self.value = value
+        self.validators = validators or None
+
+
+class CacheEntry:
+    """A cached value together with the time it was stored and its HTTP validators"""
+    __slots__ = ("value", "timestamp", "size", "validators", "encoded")
+
+    def __init__(self, value, timestamp=None, size=None, validators=None):
+        self.value = value
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.size = estimate_size(value) if size is None else size
+        self.validators = validators or None
+        # Serialized response body, built on first request (see CacheBackend.encoded)
+        self.encoded = None
+
+    def age(self, now=None):
+        return (time.time() if now is None else now) - self.timestamp
+
+
+def _sorted_families(ttls):
+    # Longest prefix first so "movies_now" can override "movies_"
+    return sorted((ttls or {}).items(), key=lambda item: len(item[0]), reverse=True)
+
+
+class CacheBackend:
+    """
+    Interface shared by the cache backends.
+
+    Keys are grouped into families by prefix (e.g. "movie_detail_"), each with
+    its own soft TTL and hard TTL. Past the soft TTL an entry is stale: it can
+    still be served while a refresh runs. Past the hard TTL it is gone.
+    Subclasses implement storage (lookup/peek/set/delete/clear/items/stats).
+    """
+
+    # True when entries survive a restart without a snapshot
+    persistent = False
+
+    def __init__(self, max_entries=2000, max_bytes=64 * 1024 * 1024, ttls=None, default_ttl=3600,
+                 hard_ttls=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.ttls = _sorted_families(ttls)
+        self.hard_ttls = _sorted_families(hard_ttls)
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        # Incremented on every write so snapshot writers can skip unchanged caches
+        self.version = 0
+
+    def ttl_for(self, key):
+        """Return the soft TTL (seconds) for the key family the key belongs to"""
+        for prefix, ttl in self.ttls:
+            if key.startswith(prefix):
+                return ttl
+        return self.default_ttl
+
+    def hard_ttl_for(self, key):
+        """Return the hard TTL (seconds); never shorter than the soft TTL"""
+        for prefix, ttl in self.hard_ttls:
+            if key.startswith(prefix):
+                return max(ttl, self.ttl_for(key))
+        return self.ttl_for(key)
+
+    def _state(self, key, age):
+        if age >= self.hard_ttl_for(key):
+            return MISSING
+        if age >= self.ttl_for(key):
+            return STALE
+        return FRESH
+
+    def _count(self, state, count=True):
+        if not count:
+            return
+        with self._stats_lock:
+            if state is FRESH:
+                self.hits += 1
+            elif state is STALE:
+                self.stale_hits += 1
+            else:
+                self.misses += 1
+
+    def lookup(self, key, count=True):
+        """
+        Return (value, state) where state is FRESH, STALE or MISSING
+        Entries past their hard TTL are dropped and reported as MISSING
+        """
+        raise NotImplementedError
+
+    def get(self, key, default=None, count=True):
+        """
+        Return the cached value if present and fresh, otherwise default
+        Pass count=False for internal re-checks that should not skew the stats
+        """
+        value, state = self.lookup(key, count=False)
+        if state is not FRESH:
+            state = MISSING
+        self._count(state, count)
+        return value if state is FRESH else default
+
+    def peek(self, key, default=None):
+        """Return the cached value regardless of age, without touching LRU order or stats"""
+        raise NotImplementedError
+
+    def set(self, key, value, timestamp=None, validators=None):
+        """Store a value (and optional HTTP validators) and evict old entries if over budget"""
+        raise NotImplementedError
+
+    def touch(self, key):
+        """
+        Mark an entry as freshly fetched without replacing its value
+        Used when the upstream answers 304 Not Modified. Returns the value or MISSING.
+        """
+        raise NotImplementedError
+
+    def validators(self, key):
+        """Return the HTTP validators stored with an entry (or None), regardless of age"""
+        raise NotImplementedError
+
+    def encoded(self, key):
+        """
+        Return the entry's value as an EncodedBody (or None if not cached)
+        The serialized bytes are kept with the entry so repeated responses
+        don't re-serialize the same value.
+        """
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def items(self):
+        """Return a list of (key, value, timestamp, validators) for every entry, oldest first"""
+        raise NotImplementedError
+
+    def purge_expired(self):
+        """Drop every entry past its hard TTL; returns the number of entries removed"""
+        now = time.time()
+        expired = [key for key, _, timestamp, _ in self.items() if now - timestamp >= self.hard_ttl_for(key)]
+        for key in expired:
+            self.delete(key)
+        with self._stats_lock:
+            self.expirations += len(expired)
+        return len(expired)
+
+    def claim_refresh(self, key, seconds):
+        """
+        Claim the right to refresh key for the next `seconds`
+        Shared backends use this so only one worker refreshes a stale entry
+        """
+        return True
+
+    def _usage(self):
+        """Return (entries, bytes) currently stored"""
+        raise NotImplementedError
+
+    def stats(self):
+        """Return hit/miss/eviction counters and current usage"""
+        entries, used_bytes = self._usage()
+        with self._stats_lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "backend": type(self).__name__,
+                "entries": entries,
+                "bytes": used_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def __contains__(self, key):
+        return self.lookup(key, count=False)[1] is FRESH
+
+    def __len__(self):
+        return self._usage()[0]
+
+
+class TTLCache(CacheBackend):
+    """
+    Thread-safe in-process LRU cache with per-key-family TTLs.
+    Entries are evicted least-recently-used first whenever the entry count or
+    the estimated byte budget is exceeded.
+    """
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._bytes = 0
+
+    def lookup(self, key, count=True):
+        with self._lock:
+            entry = self._entries.get(key)
+            state = MISSING if entry is None else self._state(key, entry.age())
+            if entry is not None and state is MISSING:
+                self._remove(key)
+                with self._stats_lock:
+                    self.expirations += 1
+            elif state is not MISSING:
+                self._entries.move_to_end(key)
+        self._count(state, count)
+        return (None, MISSING) if state is MISSING else (entry.value, state)
+
+    def peek(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            return default if entry is None else entry.value
+
+    def set(self, key, value, timestamp=None, validators=None):
+        entry = CacheEntry(value, timestamp, validators=validators)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self.version += 1
+            self._evict()
+        return value
+
+    def touch(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            entry.timestamp = time.time()
+            self._entries.move_to_end(key)
+            self.version += 1
+            return entry.value
+
+    def validators(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry.validators
+
+    def encoded(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.encoded is None:
+            # Racing threads may both encode; either result is identical
+            entry.encoded = EncodedBody.from_value(entry.value)
+            size = len(entry.encoded.body)
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    entry.size += size
+                    self._bytes += size
+                    # The encoded copy counts against the byte budget too
+                    self._entries.move_to_end(key)
+                    self._evict()
+        return entry.encoded
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def items(self):
+        with self._lock:
+            return [(key, entry.value, entry.timestamp, entry.validators) for key, entry in self._entries.items()]
+
+    def purge_expired(self):
+        with self._lock:
+            now = time.time()
+            expired = [key for key, entry in self._entries.items() if entry.age(now) >= self.hard_ttl_for(key)]
+            for key in expired:
+                self._remove(key)
+        with self._stats_lock:
+            self.expirations += len(expired)
+        return len(expired)
+
+    def _usage(self):
+        with self._lock:
+            return len(self._entries), self._bytes
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _evict(self):
+        # Expired entries go first, then least recently used ones
+        expired = evicted = 0
+        if len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            now = time.time()
+            for key in [k for k, e in self._entries.items() if e.age(now) >= self.hard_ttl_for(k)]:
+                self._remove(key)
+                expired += 1
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            # Never evict the entry that was just inserted
+            if len(self._entries) == 1:
+                break
+            key = next(iter(self._entries))
+            self._remove(key)
+            evicted += 1
+        if expired or evicted:
+            with self._stats_lock:
+                self.expirations += expired
+                self.evictions += evicted
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache stored in a local SQLite file so several WSGI workers share it.
+    Values are stored as JSON. Hit/miss counters are per process; entry and
+    byte usage reflect the shared file.
+    """
+
+    persistent = True
+
+    # Only bump an entry's LRU timestamp when it is older than this (saves writes)
+    ACCESS_RESOLUTION = 60
+
+    def __init__(self, path, **options):
+        super().__init__(**options)
+        self.path = path
+        # key -> (timestamp, EncodedBody) for values this process has served
+        self._encoded = OrderedDict()
+        self._encoded_lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, timestamp REAL NOT NULL, "
+                "accessed REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_entries_accessed ON cache_entries (accessed)")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache_leases (key TEXT PRIMARY KEY, expires REAL NOT NULL)")
+            # Files created before validators were stored lack the column
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(cache_entries)")]
+            if "validators" not in columns:
+                conn.execute("ALTER TABLE cache_entries ADD COLUMN validators TEXT")
+            # Values written in an older format can't be decoded any more
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SNAPSHOT_VERSION:
+                conn.execute("DELETE FROM cache_entries")
+                conn.execute(f"PRAGMA user_version = {SNAPSHOT_VERSION}")
+
+    def _connection(self):
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def lookup(self, key, count=True):
+        conn = self._connection()
+        row = conn.execute("SELECT value, timestamp, accessed FROM cache_entries WHERE key = ?", (key,)).fetchone()
+        state = MISSING
+        value = None
+        if row is not None:
+            now = time.time()
+            state = self._state(key, now - row[1])
+            if state is MISSING:
+                conn.execute("DELETE FROM cache_entries WHERE key = ? AND timestamp = ?", (key, row[1]))
+                with self._stats_lock:
+                    self.expirations += 1
+            else:
+                value = loads(row[0])
+                if now - row[2] >= self.ACCESS_RESOLUTION:
+                    conn.execute("UPDATE cache_entries SET accessed = ? WHERE key = ?", (now, key))
+        self._count(state, count)
+        return value, state
+
+    def peek(self, key, default=None):
+        row = self._connection().execute("SELECT value FROM cache_entries WHERE key = ?", (key,)).fetchone()
+        return default if row is None else loads(row[0])
+
+    def set(self, key, value, timestamp=None, validators=None):
+        text = dumps(value).decode("utf-8")
+        timestamp = time.time() if timestamp is None else timestamp
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, timestamp, accessed, size, validators) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, text, timestamp, time.time(), len(text), json.dumps(validators) if validators else None),
+            )
+            self._evict(conn, key)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        with self._stats_lock:
+            self.version += 1
+        return value
+
+    def touch(self, key):
+        conn = self._connection()
+        now = time.time()
+        cursor = conn.execute("UPDATE cache_entries SET timestamp = ?, accessed = ? WHERE key = ?", (now, now, key))
+        if cursor.rowcount == 0:
+            return MISSING
+        with self._stats_lock:
+            self.version += 1
+        return self.peek(key, MISSING)
+
+    def validators(self, key):
+        row = self._connection().execute("SELECT validators FROM cache_entries WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def encoded(self, key):
+        row = self._connection().execute("SELECT value, timestamp FROM cache_entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        text, timestamp = row
+        with self._encoded_lock:
+            memo = self._encoded.get(key)
+            if memo is not None and memo[0] == timestamp:
+                self._encoded.move_to_end(key)
+                return memo[1]
+        # The stored text keeps record tags, so decode it once and re-encode for clients
+        encoded = EncodedBody.from_value(loads(text))
+        with self._encoded_lock:
+            self._encoded[key] = (timestamp, encoded)
+            while len(self._encoded) > self.max_entries:
+                self._encoded.popitem(last=False)
+        return encoded
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache_entries")
+
+    def items(self):
+        rows = self._connection().execute(
+            "SELECT key, value, timestamp, validators FROM cache_entries ORDER BY accessed"
+        ).fetchall()
+        return [
+            (key, loads(value), timestamp, json.loads(validators) if validators else None)
+            for key, value, timestamp, validators in rows
+        ]
+
+    def purge_expired(self):
+        conn = self._connection()
+        now = time.time()
+        rows = conn.execute("SELECT key, timestamp FROM cache_entries").fetchall()
+        expired = [(key, timestamp) for key, timestamp in rows if now - timestamp >= self.hard_ttl_for(key)]
+        purged = 0
+        if expired:
+            # Matching the timestamp leaves entries another worker refreshed meanwhile
+            purged = conn.executemany("DELETE FROM cache_entries WHERE key = ? AND timestamp = ?", expired).rowcount
+        with self._stats_lock:
+            self.expirations += purged
+        return purged
+
+    def claim_refresh(self, key, seconds):
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT expires FROM cache_leases WHERE key = ?", (key,)).fetchone()
+            claimed = row is None or row[0] <= now
+            if claimed:
+                conn.execute("INSERT OR REPLACE INTO cache_leases (key, expires) VALUES (?, ?)", (key, now + seconds))
+            conn.execute("COMMIT")
+            return claimed
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _usage(self):
+        count, used_bytes = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries"
+        ).fetchone()
+        return count, used_bytes
+
+    def _evict(self, conn, keep_key):
+        count, used_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries").fetchone()
+        if count <= self.max_entries and used_bytes <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size FROM cache_entries ORDER BY accessed").fetchall():
+            if count <= self.max_entries and used_bytes <= self.max_bytes:
+                break
+            if key == keep_key:
+                continue
+            conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+            count -= 1
+            used_bytes -= size
+            evicted += 1
+        with self._stats_lock:
+            self.evictions += evicted
+
+
+def create_cache(backend="memory", path=None, **options):
+    """Create the cache backend selected by name ('memory' or 'sqlite')"""
+    if backend == "memory":
+        return TTLCache(**options)
+    if backend == "sqlite":
+        if not path:
+            raise ValueError("The sqlite cache backend needs a file path")
+        return SQLiteCache(path, **options)
+    raise ValueError(f"Unknown cache backend '{backend}' (expected 'memory' or 'sqlite')")
+
+
+def save_snapshot(cache, path):
+    """
+    Write every cache entry with its timestamp and validators to path as JSON
+    The file is replaced atomically so readers never see a partial snapshot
+    """
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "saved_at": time.time(),
+        "entries": cache.items(),
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmdb_cache-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, separators=(",", ":"), default=_tagged_record)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return len(snapshot["entries"])
+
+
+def load_snapshot(cache, path):
+    """
+    Restore cache entries from a snapshot written by save_snapshot
+    Corrupt or version-mismatched snapshots are deleted and ignored.
+    Entries already past their hard TTL are skipped.
+    Returns the number of entries restored.
+    """
+    if not os.path.exists(path):
+        return 0
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f, object_hook=_decode_record)
+        if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"unsupported snapshot version {snapshot.get('version') if isinstance(snapshot, dict) else None!r}")
+        entries = [
+            (str(key), value, float(timestamp), validators)
+            for key, value, timestamp, validators in snapshot["entries"]
+        ]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"[CACHE] Discarding unusable cache snapshot {path}: {e}")
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return 0
+
+    now = time.time()
+    restored = 0
+    for key, value, timestamp, validators in entries:
+        if now - timestamp < cache.hard_ttl_for(key):
+            cache.set(key, value, timestamp=timestamp, validators=validators)
+            restored += 1
+    return restored
+
+
+class SnapshotWriter:
+    """
+    Periodically purges expired entries and saves a cache snapshot from a daemon thread
+    Skips the write when nothing changed since the last save. With path=None
+    it only purges (persistent backends, or snapshots disabled).
+    """
+
+    def __init__(self, cache, path, interval=300):
+        self.cache = cache
+        self.path = path
+        self.interval = interval
+        self._saved_version = cache.version
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True, name="cache-snapshot")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def save(self, force=False):
+        """Write a snapshot if the cache changed (or always when force=True)"""
+        if not self.path:
+            return False
+        with self._lock:
+            version = self.cache.version
+            if not force and version == self._saved_version:
+                return False
+            try:
+                count = save_snapshot(self.cache, self.path)
+                self._saved_version = version
+                print(f"[CACHE] Saved {count} entries to {self.path}")
+                return True
+            except Exception as e:
+                print(f"[CACHE] Warning: Failed to save cache snapshot: {e}")
+                return False
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                # Entries nobody reads again would otherwise stay until memory pressure evicts them
+                purged = self.cache.purge_expired()
+                if purged:
+                    print(f"[CACHE] Purged {purged} expired entries")
+            except Exception as e:
+                print(f"[CACHE] Warning: Failed to purge expired entries: {e}")
+            self.save()
+
+
+class _Call:
+    """An in-flight call that other callers can wait on"""
+    __slots__ = ("event", "result", "error", "waiters")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into a single execution.
+    Callers arriving while a call is in flight wait for it and share its
+    result, or re-raise its exception.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn, timeout=None):
+        """
+        Run fn (or wait for the call already running for key) and return its result
+        Waiters give up with TimeoutError after `timeout` seconds; the call itself
+        keeps running for whoever else is waiting.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+        if not leader:
+            if not call.event.wait(timeout):
+                raise TimeoutError(f"Timed out waiting for in-flight call '{key}'")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+class BackgroundRefresher:
+    """
+    Runs cache refreshes on a small dedicated thread pool.
+    At most one refresh per key is queued at a time; failures are logged and
+    the stale value simply keeps being served until the next attempt.
+    """
+
+    def __init__(self, max_workers=2, name="cache-refresh"):
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = set()
+        self.refreshes = 0
+        self.failures = 0
+
+    def submit(self, key, fn):
+        """Queue fn to refresh key; returns False if a refresh is already queued"""
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+        self._executor.submit(self._run, key, fn)
+        return True
+
+    def _run(self, key, fn):
+        try:
+            fn()
+            with self._lock:
+                self.refreshes += 1
+        except Exception as e:
+            print(f"[CACHE] {self.name} of '{key}' failed: {e}")
+            with self._lock:
+                self.failures += 1
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "refreshes": self.refreshes,
+                "failures": self.failures,
+            }
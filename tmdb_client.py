@@ -0,0 +1,399 @@
+import os
+import random
+import threading
+import time
+import contextvars
+from contextlib import contextmanager
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+API_KEY = os.getenv("TMDB_API_KEY")
+if not API_KEY:
+    raise ValueError("TMDB_API_KEY environment variable is not set")
+# Overridable so the app can be pointed at a local stub TMDB server
+BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")
+
+# Size of the shared executor and of the (blocking) connection pool, so at most
+# this many TMDB requests are in flight per process
+MAX_WORKERS = int(os.getenv("TMDB_MAX_WORKERS", "8"))
+# Token bucket: sustained requests per second and burst size (TMDB allows ~50/s)
+RATE_LIMIT = float(os.getenv("TMDB_RATE_LIMIT", "35"))
+RATE_BURST = int(os.getenv("TMDB_RATE_BURST", "20"))
+# Retries for 429s, 5xx responses and dropped connections
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+# Circuit breaker: consecutive failed attempts before TMDB calls start failing fast,
+# and how long to wait before letting a probe request through
+BREAKER_THRESHOLD = int(os.getenv("TMDB_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET = float(os.getenv("TMDB_BREAKER_RESET", "30"))
+
+
+class TMDBError(Exception):
+    """Raised when TMDB keeps failing after all retries"""
+
+
+class CircuitOpenError(TMDBError):
+    """Raised without contacting TMDB while the circuit breaker is open"""
+
+
+class DeadlineExceeded(TMDBError):
+    """Raised when the current request has used up its TMDB time budget"""
+
+
+# Failures that say nothing about the data itself (outage, timeout, exhausted budget);
+# callers must not cache a fallback answer when they see one of these
+TRANSIENT_ERRORS = (TMDBError, requests.ConnectionError, requests.Timeout, TimeoutError, FutureTimeoutError)
+
+# Absolute time.monotonic() by which TMDB work for the current request must finish
+_deadline = contextvars.ContextVar("tmdb_deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds):
+    """
+    Bound the total time TMDB calls made inside the block may take
+    Nested deadlines can only shorten the budget. Work fanned out with
+    submit() carries the deadline of the code that submitted it.
+    """
+    current = _deadline.get()
+    end = time.monotonic() + seconds
+    token = _deadline.set(end if current is None else min(current, end))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """Return the seconds left in the current deadline, or None if there is none"""
+    end = _deadline.get()
+    return None if end is None else end - time.monotonic()
+
+
+def _sleep(seconds):
+    # Never sleep past the deadline; give up straight away instead
+    budget = remaining()
+    if budget is not None and budget < seconds:
+        raise DeadlineExceeded(f"TMDB deadline would pass while backing off for {seconds:.1f}s")
+    time.sleep(seconds)
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every TMDB call in this process.
+    A 429 response pauses the whole bucket for the Retry-After period so the
+    other threads back off too instead of piling on more 429s.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def acquire(self, deadline=None):
+        """Block until a request may be sent; raises DeadlineExceeded rather than wait past deadline"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+                if deadline is not None and now + wait > deadline:
+                    raise DeadlineExceeded("TMDB deadline would pass while waiting for the rate limiter")
+                self.waited += wait
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Stop handing out tokens for the given number of seconds"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to TMDB while it is failing.
+    After `threshold` consecutive failed attempts the circuit opens and calls
+    fail fast with CircuitOpenError. Once `reset_timeout` seconds have passed a
+    single probe request is let through; its outcome closes or re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    def available(self):
+        """Return True if a request could be sent now (closed, or due for a probe)"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            return self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout
+
+    def allow(self):
+        """Claim permission to send one request; the caller must record its outcome"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self.state = self.CLOSED
+
+    def release(self):
+        """Give back a claimed request whose outcome says nothing about TMDB's health"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.threshold:
+                if self.state != self.OPEN:
+                    self.opened += 1
+                    print(f"[TMDB] Circuit breaker open after {self._failures} failures; "
+                          f"retrying in {self.reset_timeout:.0f}s")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+# One long-lived pool for all TMDB work (discovery checks, detail fetches...)
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="tmdb")
+limiter = RateLimiter(RATE_LIMIT, RATE_BURST)
+breaker = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_RESET)
+
+# Session with a connection pool sized to the executor (reuses connections).
+# pool_block makes extra callers wait for a free connection instead of opening more.
+session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_WORKERS, pool_block=True)
+session.mount("https://", _adapter)
+session.mount("http://", _adapter)
+# requests never passes urllib3 a pool timeout, so callers take one of these
+# before using the session; unlike the pool's own wait, this one is bounded
+_connection_slots = threading.BoundedSemaphore(MAX_WORKERS)
+
+_stats_lock = threading.Lock()
+_stats = {
+    "requests": 0, "not_modified": 0, "retries": 0, "rate_limited": 0, "errors": 0,
+    "short_circuited": 0, "deadline_exceeded": 0, "pool_timeouts": 0,
+}
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _backoff(attempt):
+    # Exponential backoff with jitter so retries don't line up
+    return BACKOFF_BASE * (2 ** attempt) * (0.5 + random.random())
+
+
+def _retry_after(response):
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", "")))
+    except ValueError:
+        return None
+
+
+def _request(path, params, timeout, headers=None):
+    query = {"api_key": API_KEY}
+    query.update(params or {})
+    url = f"{BASE_URL}{path}"
+
+    try:
+        for attempt in range(MAX_RETRIES + 1):
+            if not breaker.available():
+                raise CircuitOpenError(f"TMDB circuit breaker is open; not requesting {path}")
+            limiter.acquire(_deadline.get())
+            budget = remaining()
+            if budget is not None and budget <= 0:
+                raise DeadlineExceeded(f"TMDB deadline passed before requesting {path}")
+            # The per-call timeout (and the wait for a connection) never outlasts the request's remaining budget
+            call_timeout = timeout if budget is None else min(timeout, budget)
+            if not _connection_slots.acquire(timeout=call_timeout):
+                _count("pool_timeouts")
+                if budget is not None and budget < timeout:
+                    raise DeadlineExceeded(f"TMDB deadline passed while waiting for a connection for {path}")
+                raise TMDBError(f"No free TMDB connection after {call_timeout:.1f}s for {path}")
+            if not breaker.allow():
+                _connection_slots.release()
+                raise CircuitOpenError(f"TMDB circuit breaker is open; not requesting {path}")
+
+            _count("requests")
+            try:
+                try:
+                    response = session.get(url, params=query, headers=headers, timeout=call_timeout)
+                finally:
+                    _connection_slots.release()
+            except requests.Timeout:
+                if budget is not None and budget < timeout:
+                    # We cut the timeout short for the deadline; that's not TMDB's fault
+                    breaker.release()
+                    raise DeadlineExceeded(f"TMDB deadline passed while requesting {path}") from None
+                breaker.record_failure()
+                if attempt == MAX_RETRIES:
+                    _count("errors")
+                    raise
+                _count("retries")
+                _sleep(_backoff(attempt))
+                continue
+            except requests.ConnectionError:
+                breaker.record_failure()
+                if attempt == MAX_RETRIES:
+                    _count("errors")
+                    raise
+                _count("retries")
+                _sleep(_backoff(attempt))
+                continue
+            except BaseException:
+                breaker.record_failure()
+                raise
+
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+
+            if response.status_code == 429:
+                _count("rate_limited")
+                if attempt == MAX_RETRIES:
+                    break
+                _count("retries")
+                limiter.pause(_retry_after(response) or _backoff(attempt))
+                continue
+            if response.status_code >= 500 and attempt < MAX_RETRIES:
+                _count("retries")
+                _sleep(_backoff(attempt))
+                continue
+
+            if response.status_code >= 500:
+                # Still failing after the retries: an outage, not an answer about the data
+                _count("errors")
+                raise TMDBError(f"TMDB returned {response.status_code} for {path} after {MAX_RETRIES} retries")
+            if not response.ok:
+                _count("errors")
+            # Don't hand TMDB error bodies to callers as if they were data
+            response.raise_for_status()
+            return response
+    except CircuitOpenError:
+        _count("short_circuited")
+        raise
+    except DeadlineExceeded:
+        _count("deadline_exceeded")
+        raise
+
+    _count("errors")
+    raise TMDBError(f"TMDB still rate limiting {path} after {MAX_RETRIES} retries")
+
+
+def get_json(path, params=None, timeout=10):
+    """
+    GET a TMDB endpoint (e.g. "/genre/movie/list") and return the parsed JSON
+    Waits for the rate limiter and a pooled connection, and retries 429/5xx
+    responses with backoff. Runs in the calling thread; use submit() to fan
+    work out onto the shared executor.
+    """
+    return _request(path, params, timeout).json()
+
+
+def get_json_conditional(path, params=None, validators=None, timeout=10):
+    """
+    Like get_json, but revalidates a cached copy using its stored validators
+    Sends If-None-Match / If-Modified-Since built from validators and returns
+    (body, validators). body is None when TMDB answered 304 Not Modified.
+    """
+    headers = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+    response = _request(path, params, timeout, headers=headers)
+    new_validators = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+    new_validators = {name: value for name, value in new_validators.items() if value}
+    if response.status_code == 304:
+        _count("not_modified")
+        return None, new_validators or validators
+    return response.json(), new_validators or None
+
+
+# Jobs submitted to the executor that haven't started yet (see stats)
+_queued = 0
+_queued_lock = threading.Lock()
+
+
+def _dequeued():
+    global _queued
+    with _queued_lock:
+        _queued -= 1
+
+
+def submit(fn, *args, **kwargs):
+    """Run fn on the shared TMDB executor and return its future (keeps the caller's deadline)"""
+    global _queued
+    context = contextvars.copy_context()
+
+    def run():
+        _dequeued()
+        return context.run(fn, *args, **kwargs)
+
+    with _queued_lock:
+        _queued += 1
+    future = executor.submit(run)
+    # A job cancelled before it started never runs, so it leaves the queue here instead
+    future.add_done_callback(lambda future: future.cancelled() and _dequeued())
+    return future
+
+
+def result(future):
+    """Wait for a future from submit(), but no longer than the current deadline allows"""
+    try:
+        return future.result(timeout=remaining())
+    except FutureTimeoutError:
+        if future.done():
+            raise
+        _count("deadline_exceeded")
+        raise DeadlineExceeded("TMDB deadline passed while waiting for a background call") from None
+
+
+def stats():
+    """Return request/retry counters and limiter wait time"""
+    with _stats_lock:
+        result = dict(_stats)
+    result["max_workers"] = MAX_WORKERS
+    with _queued_lock:
+        result["queued"] = _queued
+    result["rate_limit_wait_seconds"] = round(limiter.waited, 3)
+    result["breaker_state"] = breaker.state
+    result["breaker_opened"] = breaker.opened
+    return result